@@ -0,0 +1,575 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+#
+# Benchmarks for the hot paths of cef_package_update.py on synthetic,
+# offline fixtures: an archive with the layout of a CEF binary
+# distribution, a cefbuilds index page and the debian/ template tree.
+# The download benchmarks fetch the archive from a local server which
+# limits each connection to download_connection_rate.
+# The startup benchmarks run the updater in a new interpreter, with
+# `-X importtime' for the import of cef_package_update and `--list'
+# against the fixture index page with a cold and a warm index cache.
+#
+#   ./benchmark.py --save               record benchmark-baseline.json
+#   ./benchmark.py                      compare against it
+#   ./benchmark.py --size 3G -k extract run only the extract benchmarks
+#                                       on a multi-GB archive
+import sys
+import argparse
+import os
+import os.path
+import json
+import time
+import shutil
+import tarfile
+import random
+import platform
+import importlib.util
+import threading
+import subprocess
+import multiprocessing
+import http.server
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, base_dir)
+import cef_package_update as cpu
+
+fixture_version = '78.3.9+gc7345f2+chromium-78.0.3904.108'
+fixture_prefix = 'cef_binary_%s_linux64' % fixture_version
+
+# share of the archive size for the large files of a CEF distribution
+fixture_large_files = [
+    ('Debug/libcef.so', 0.45),
+    ('Release/libcef.so', 0.38),
+    ('Resources/cef.pak', 0.02),
+    ('Resources/cef_100_percent.pak', 0.005),
+    ('Resources/cef_200_percent.pak', 0.005),
+    ('Resources/devtools_resources.pak', 0.01),
+    ('Resources/icudtl.dat', 0.05),
+    ('Release/libGLESv2.so', 0.02),
+    ('Debug/libGLESv2.so', 0.03),
+    ('Release/snapshot_blob.bin', 0.01),
+    ('Release/v8_context_snapshot.bin', 0.01),
+]
+
+# number of small files in the directories of a CEF distribution
+fixture_small_files = [
+    ('include', '.h', 180, 8 * 1024),
+    ('include/capi', '.h', 120, 12 * 1024),
+    ('include/internal', '.h', 40, 8 * 1024),
+    ('include/wrapper', '.h', 20, 6 * 1024),
+    ('libcef_dll/cpptoc', '.cc', 200, 10 * 1024),
+    ('libcef_dll/ctocpp', '.cc', 200, 10 * 1024),
+    ('libcef_dll/wrapper', '.cc', 30, 8 * 1024),
+    ('Resources/locales', '.pak', 54, 200 * 1024),
+    ('cmake', '.cmake', 4, 16 * 1024),
+    ('tests/cefclient/browser', '.cc', 120, 16 * 1024),
+    ('tests/ceftests', '.cc', 150, 20 * 1024),
+]
+
+cef_version_h = '''#ifndef CEF_INCLUDE_CEF_VERSION_H_
+#define CEF_INCLUDE_CEF_VERSION_H_
+
+#define CEF_VERSION "%(version)s"
+#define CEF_VERSION_MAJOR 78
+#define CEF_VERSION_MINOR 3
+#define CEF_VERSION_PATCH 9
+#define CEF_COMMIT_NUMBER 2089
+#define CEF_COMMIT_HASH "c7345f2a5f2d6c4b2c1b2d1f2c7345f2a5f2d6c4"
+#define COPYRIGHT_YEAR 2019
+
+#define CHROME_VERSION_MAJOR 78
+#define CHROME_VERSION_MINOR 0
+#define CHROME_VERSION_BUILD 3904
+#define CHROME_VERSION_PATCH 108
+
+#endif  // CEF_INCLUDE_CEF_VERSION_H_
+''' % { 'version': fixture_version }
+
+
+class fixtures(object):
+    """Creates the benchmark input below `fixture_dir' unless it exists
+       from a previous run with the same size.
+    """
+    def __init__(self, fixture_dir, archive_size, verbose=False):
+        self.dir = fixture_dir
+        self.archive_size = archive_size
+        self.verbose = verbose
+        self._random = random.Random(archive_size)
+        self.tree = os.path.join(self.dir, 'tree')
+        self.archive = os.path.join(self.dir, fixture_prefix + '.tar.bz2')
+        self.tar = os.path.join(self.dir, fixture_prefix + '.tar')
+        self.index = os.path.join(self.dir, 'index.html')
+        self.debian = os.path.join(base_dir, 'debian')
+
+    def prepare(self):
+        stamp = os.path.join(self.dir, 'fixtures.json')
+        try:
+            with open(stamp, 'r') as f:
+                if json.load(f).get('archive_size') == self.archive_size:
+                    return
+        except (IOError, ValueError):
+            pass
+        if os.path.isdir(self.dir):
+            shutil.rmtree(self.dir)
+        cpu.mkdir_p(self.dir)
+        start = time.monotonic()
+        self._make_tree()
+        self._make_archives()
+        self._make_index()
+        with open(stamp, 'w') as f:
+            json.dump({ 'archive_size': self.archive_size }, f)
+        if self.verbose:
+            print('Created fixtures in %s in %.1fs' % (self.dir, time.monotonic() - start))
+
+    def _data(self, size):
+        # about half of the content is incompressible, like the binaries
+        # of a CEF distribution
+        ret = bytearray()
+        while len(ret) < size:
+            n = min(size - len(ret), 64 * 1024)
+            if self._random.random() < 0.5:
+                ret += self._random.randbytes(n)
+            else:
+                ret += bytes([self._random.randrange(256)]) * n
+        return bytes(ret)
+
+    def _write(self, name, size):
+        path = os.path.join(self.tree, fixture_prefix, name)
+        cpu.mkdir_p(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            while size > 0:
+                chunk = self._data(min(size, 16 * 1024 * 1024))
+                f.write(chunk)
+                size -= len(chunk)
+
+    def _make_tree(self):
+        for (name, share) in fixture_large_files:
+            self._write(name, int(self.archive_size * share))
+        for (subdir, ext, count, size) in fixture_small_files:
+            for i in range(count):
+                self._write(os.path.join(subdir, 'file_%03i%s' % (i, ext)), self._random.randrange(size // 4, size))
+        with open(os.path.join(self.tree, fixture_prefix, 'include/cef_version.h'), 'w') as f:
+            f.write(cef_version_h)
+        for name in ['CMakeLists.txt', 'LICENSE.txt', 'README.txt']:
+            self._write(name, 4096)
+        os.symlink('libcef.so', os.path.join(self.tree, fixture_prefix, 'Release/libcef.so.1'))
+
+    def _make_archives(self):
+        with tarfile.open(self.tar, 'w', format=tarfile.PAX_FORMAT) as tar:
+            tar.add(os.path.join(self.tree, fixture_prefix), arcname=fixture_prefix)
+        with open(self.tar, 'rb') as src, open(self.archive, 'wb') as dst:
+            (ext, commands, stdlib_mode) = cpu.tar_compressors['bz2']
+            for cmd in commands:
+                if shutil.which(cmd[0]):
+                    subprocess.check_call(cmd, stdin=src, stdout=dst)
+                    break
+            else:
+                import bz2
+                compressor = bz2.BZ2Compressor(9)
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(compressor.compress(chunk))
+                dst.write(compressor.flush())
+
+    def _make_index(self):
+        # the real page lists a few hundred builds for each platform
+        rows = []
+        for p in ['windows32', 'windows64', 'macosx64', 'linux32', 'linux64', 'linuxarm', 'linuxarm64']:
+            rows.append('<h3>%s</h3><table id="%s" class="builds">' % (p, p))
+            for major in range(90, 70, -1):
+                for patch in range(40, 20, -1):
+                    version = '%i.0.%i+g%07x+chromium-%i.0.3945.%i' % (major, patch, self._random.randrange(1 << 28), major, patch)
+                    rows.append('<tr class="toprow" data-version="%s"><td><a href="#%s">%s</a></td><td>2020-01-01</td></tr>' % (version, version, version))
+                    for kind in ['Standard', 'Minimal', 'Client', 'Debug Symbols', 'Release Symbols']:
+                        archive = 'cef_binary_%s_%s.tar.bz2' % (version, p)
+                        rows.append('<tr class="filerow" data-version="%s"><td><a href="%s">%s</a> (100 MB) [<a href="%s.sha1">sha1</a>]</td></tr>' % (version, archive, kind, archive))
+            rows.append('</table>')
+        with open(self.index, 'w') as f:
+            f.write('<html><body>\n' + '\n'.join(rows) + '\n</body></html>\n')
+
+
+# throughput of each connection to the benchmark download server; like a
+# CDN which limits single connections, where segmented downloads pay off
+download_connection_rate = 32 * 1024 * 1024
+
+class _range_handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send(head=True)
+
+    def do_GET(self):
+        self._send(head=False)
+
+    def _send(self, head):
+        filename = self.server.filename
+        size = os.path.getsize(filename)
+        start, end = 0, size - 1
+        status = 200
+        r = self.headers.get('Range', '')
+        if r.startswith('bytes='):
+            first, _, last = r[6:].partition('-')
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            status = 206
+        self.send_response(status)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end + 1 - start))
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %i-%i/%i' % (start, end, size))
+        self.end_headers()
+        if head:
+            return
+        chunk_size = 256 * 1024
+        with open(filename, 'rb') as f:
+            f.seek(start)
+            left = end + 1 - start
+            begin = time.monotonic()
+            sent = 0
+            while left > 0:
+                data = f.read(min(chunk_size, left))
+                self.wfile.write(data)
+                left -= len(data)
+                sent += len(data)
+                delay = sent / download_connection_rate - (time.monotonic() - begin)
+                if delay > 0:
+                    time.sleep(delay)
+
+def _start_range_server(filename):
+    """Serve `filename' with Range support on a free local port."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _range_handler)
+    server.daemon_threads = True
+    server.filename = filename
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return 'http://127.0.0.1:%i/%s' % (server.server_address[1], os.path.basename(filename))
+
+def _debian_files(fx):
+    ret = []
+    for root, dirs, files in os.walk(fx.debian):
+        for name in files:
+            ret.append(os.path.join(root, name))
+    return sorted(ret)
+
+def _tree_root(fx):
+    return os.path.join(fx.tree, fixture_prefix)
+
+# name -> (setup, run); setup prepares the work directory and returns the
+# argument for run, which is the timed part; a dict returned by run is
+# added to the result
+def _bench_extract_archive(workers):
+    return (lambda fx, work: None,
+            lambda fx, work, arg: cpu.extract_archive(fx.archive, work, prefix=fixture_prefix, workers=workers))
+
+def _run_extract_all_to(fx, work, arg):
+    with cpu.MyTarFile.open(fx.tar, 'r|') as tar:
+        tar.extract_all_to(work, prefix=fixture_prefix, workers=arg)
+
+def _setup_copy(fx, work):
+    cpu.copytree(_tree_root(fx), os.path.join(work, 'dst'))
+
+def _setup_obsolete(fx, work):
+    dst = os.path.join(work, 'dst')
+    cpu.copytree(_tree_root(fx), dst)
+    for i in range(2000):
+        d = os.path.join(dst, 'obsolete/dir_%02i' % (i % 50))
+        cpu.mkdir_p(d)
+        with open(os.path.join(d, 'file_%04i' % i), 'w') as f:
+            f.write('x')
+
+def _setup_templates(fx, work):
+    ret = []
+    for filename in _debian_files(fx):
+        if not cpu.is_binary_file(filename):
+            with open(filename, 'r') as f:
+                ret.append(f.read())
+    return ret
+
+def _run_substvars(fx, work, templates):
+    values = { 'cef:ABI': 78 }
+    for i in range(200):
+        for t in templates:
+            cpu.substVars(t, props=values)
+
+def _setup_large_template(fx, work):
+    # a large install file with a variable on every line and make
+    # variables which are kept as they are; substVars rescans the text
+    # after each substitution, so its time grows much faster than the
+    # size and the file is kept at a size it finishes in about a second
+    filename = os.path.join(work, 'libcef.install')
+    with open(filename, 'w') as f:
+        for i in range(4000):
+            f.write('usr/lib/cef${cef:ABI}/file_%06i.pak usr/share/cef${cef:ABI}/$(DEB_HOST_MULTIARCH)/locales\n' % i)
+    return filename
+
+def _run_substvars_large(fx, work, filename):
+    with open(filename, 'r') as f:
+        cpu.substVars(f.read(), props={ 'cef:ABI': 78 })
+
+def _run_template_large(fx, work, filename):
+    cpu.load_template(filename).render({ 'cef:ABI': 78 })
+
+def _run_configure_file(fx, work, arg):
+    values = { 'cef:ABI': 78 }
+    for i in range(20):
+        for filename in _debian_files(fx):
+            dst = os.path.join(work, 'out_%i' % i, os.path.relpath(filename, fx.debian))
+            cpu.mkdir_p(os.path.dirname(dst))
+            cpu.configure_file(filename, dst, values=values)
+
+def _setup_index(fx, work):
+    with open(fx.index, 'rb') as f:
+        return f.read()
+
+def _bench_tar_stream(parallel):
+    def _run(fx, work, arg):
+        # decompress and read every member, without writing anything
+        with cpu.tar_stream(fx.archive, parallel=parallel) as tar:
+            for member in tar:
+                if member.isreg():
+                    f = tar.extractfile(member)
+                    while f.read(1024 * 1024):
+                        pass
+    return (lambda fx, work: None, _run)
+
+def _run_extract_builds_lxml(fx, work, data):
+    # the tree based parser the streaming tokenizer replaced
+    from lxml import html
+    ret = []
+    tree = html.fromstring(data.decode('utf-8'))
+    platform_table = tree.xpath('//table[@id="%s"]' % 'linux64')
+    if platform_table:
+        for e in platform_table[0].xpath('tr[@class="toprow"]/@data-version'):
+            major, _ = e.split('.', 1)
+            try:
+                major = int(major)
+            except ValueError:
+                major = 0
+            if major > 3:
+                ret.append( (major, e) )
+    return ret
+
+def _setup_download(fx, work):
+    cpu.http_client_options.update(per_host=8)
+    return _start_range_server(fx.archive)
+
+def _bench_download(segments):
+    def _run(fx, work, url):
+        dest = os.path.join(work, 'download.tar.bz2')
+        if segments > 1:
+            ok = cpu.download_file_segmented(url, dest, segments=segments)
+        else:
+            ok = cpu.download_file(url, dest)
+        if not ok:
+            raise IOError('download of %s failed' % url)
+    return (_setup_download, _run)
+
+def _run_startup_import(fx, work, arg):
+    # -X importtime reports the cumulative import time in microseconds
+    proc = subprocess.run([ sys.executable, '-X', 'importtime', '-c', 'import cef_package_update' ],
+                          cwd=base_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    for line in proc.stderr.decode('utf-8').splitlines():
+        fields = [ f.strip() for f in line.split('|') ]
+        if len(fields) == 3 and fields[2] == 'cef_package_update':
+            return { 'import_ms': int(fields[1]) / 1000.0 }
+    raise ValueError('no import time reported for cef_package_update')
+
+def _run_startup_list(fx, work, arg):
+    # the updater run from the work directory with the fixture index as
+    # mirror, so the index cache lives in work/download
+    subprocess.run([ sys.executable, os.path.join(base_dir, 'setup.py'), '--list', '--mirror', 'spotify=' + fx.dir ],
+                   cwd=work, stdout=subprocess.DEVNULL, check=True)
+
+benchmarks = [
+    ('extract_archive', _bench_extract_archive(1)),
+    ('extract_archive_workers4', _bench_extract_archive(4)),
+    ('extract_all_to', (lambda fx, work: 1, _run_extract_all_to)),
+    ('extract_all_to_workers4', (lambda fx, work: 4, _run_extract_all_to)),
+    ('tar_stream_stdlib', _bench_tar_stream(False)),
+    ('tar_stream_parallel', _bench_tar_stream(True)),
+    ('copytree', (lambda fx, work: None,
+                  lambda fx, work, arg: cpu.copytree(_tree_root(fx), os.path.join(work, 'dst')))),
+    ('copy_and_overwrite', (lambda fx, work: None,
+                            lambda fx, work, arg: cpu.copy_and_overwrite(_tree_root(fx), os.path.join(work, 'dst')))),
+    ('copy_and_overwrite_unchanged', (_setup_copy,
+                                      lambda fx, work, arg: cpu.copy_and_overwrite(_tree_root(fx), os.path.join(work, 'dst')))),
+    ('remove_obsolete_files', (_setup_obsolete,
+                               lambda fx, work, arg: cpu.remove_obsolete_files(_tree_root(fx), os.path.join(work, 'dst'), verbose=False))),
+    ('substVars', (_setup_templates, _run_substvars)),
+    ('substVars_large', (_setup_large_template, _run_substvars_large)),
+    ('compiled_template_large', (_setup_large_template, _run_template_large)),
+    ('configure_file', (lambda fx, work: None, _run_configure_file)),
+    ('copy_and_configure', (lambda fx, work: None,
+                            lambda fx, work, arg: cpu.copy_and_configure(fx.debian, os.path.join(work, 'debian'), values={ 'cef:ABI': 78 }))),
+    ('download_file', _bench_download(1)),
+    ('download_file_segmented4', _bench_download(4)),
+    ('extract_builds', (_setup_index,
+                        lambda fx, work, data: cpu.extract_builds(data, platform='linux64'))),
+    ('extract_builds_majors', (_setup_index,
+                               lambda fx, work, data: cpu.extract_builds(data, platform='linux64', majors=[90]))),
+    ('extract_builds_lxml', (_setup_index, _run_extract_builds_lxml)),
+    ('startup_import', (lambda fx, work: None, _run_startup_import)),
+    ('startup_list', (lambda fx, work: None, _run_startup_list)),
+    # --list with a warm index cache
+    ('startup_list_cached', (lambda fx, work: _run_startup_list(fx, work, None), _run_startup_list)),
+]
+
+# benchmarks which need one of the given optional modules or commands
+benchmark_requires = {
+    'extract_builds_lxml': ['lxml'],
+    'tar_stream_parallel': [ c[0] for c in cpu.tar_decompressors['.bz2'] ],
+}
+
+
+def _measure(conn, name, fx, work_dir):
+    import resource
+    (setup, run) = dict(benchmarks)[name]
+    arg = setup(fx, work_dir)
+    before_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    extra = run(fx, work_dir, arg)
+    wall = time.perf_counter() - start
+    cpu_time = time.process_time() - cpu_start
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_time += (children.ru_utime - before_children.ru_utime) + (children.ru_stime - before_children.ru_stime)
+    result = {
+        'wall': wall,
+        'cpu': cpu_time,
+        'peak_rss_kb': max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, children.ru_maxrss),
+    }
+    if isinstance(extra, dict):
+        result.update(extra)
+    conn.send(result)
+    conn.close()
+
+def run_benchmark(name, fx, work_dir, repeat=1):
+    """Run benchmark `name' `repeat' times, each in a fresh process and
+       work directory, and return the run with the median wall time. The
+       fastest wall time and the spread between the fastest and slowest
+       run are added as `min_wall' and `spread'.
+    """
+    ctx = multiprocessing.get_context('fork')
+    runs = []
+    for i in range(repeat):
+        if os.path.isdir(work_dir):
+            shutil.rmtree(work_dir)
+        cpu.mkdir_p(work_dir)
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_measure, args=(child_conn, name, fx, work_dir))
+        proc.start()
+        child_conn.close()
+        try:
+            result = parent_conn.recv()
+        except EOFError:
+            result = None
+        proc.join()
+        if result is None or proc.exitcode != 0:
+            return None
+        runs.append(result)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    runs.sort(key=lambda r: r['wall'])
+    ret = runs[len(runs) // 2]
+    ret['min_wall'] = runs[0]['wall']
+    ret['spread'] = runs[-1]['wall'] - runs[0]['wall']
+    return ret
+
+def compare(results, baseline, threshold, min_delta=0.05):
+    """Returns the names of the benchmarks whose median wall time exceeds
+       the baseline by more than `threshold'. Differences below
+       `min_delta' seconds or below the spread of the repeated runs of
+       either result are treated as noise.
+    """
+    ret = []
+    for name, r in results.items():
+        b = baseline.get(name, None)
+        if b is None:
+            continue
+        noise = max(min_delta, r.get('spread', 0), b.get('spread', 0))
+        if r['wall'] > b['wall'] * (1 + threshold) and r['wall'] - b['wall'] > noise:
+            ret.append(name)
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the CEF package updater')
+    parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', help='enable verbose output.')
+    parser.add_argument('-k', dest='filters', action='append', default=[], metavar='NAME', help='only run the benchmarks containing NAME.')
+    parser.add_argument('--dir', dest='dir', default=os.path.join(base_dir, 'bench'), help='directory for fixtures and work files.')
+    parser.add_argument('--size', dest='size', default='256M', help='uncompressed size of the fixture archive (e.g. 3G).')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='run each benchmark the given number of times and keep the median.')
+    parser.add_argument('--baseline', dest='baseline', default=os.path.join(base_dir, 'benchmark-baseline.json'), help='baseline file to compare with.')
+    parser.add_argument('--save', dest='save', action='store_true', help='store the results as new baseline.')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.2, help='relative slow-down which is reported as regression.')
+    parser.add_argument('--min-delta', dest='min_delta', type=float, default=0.05, help='smallest slow-down in seconds which is reported as regression.')
+    args = parser.parse_args()
+
+    try:
+        size = cpu.parse_size(args.size)
+    except ValueError:
+        print('Invalid size %s specified.' % args.size, file=sys.stderr)
+        return 1
+    fx = fixtures(os.path.join(args.dir, 'fixtures'), size, verbose=args.verbose)
+    fx.prepare()
+
+    baseline = {}
+    if not args.save:
+        try:
+            with open(args.baseline, 'r') as f:
+                data = json.load(f)
+            if data.get('archive_size') != size:
+                print('Baseline %s was recorded with a different fixture size, not comparing.' % args.baseline, file=sys.stderr)
+            else:
+                baseline = data.get('results', {})
+        except (IOError, ValueError) as e:
+            print('No baseline %s: %s' % (args.baseline, e), file=sys.stderr)
+
+    results = {}
+    failed = []
+    for (name, funcs) in benchmarks:
+        if args.filters and not any([ f in name for f in args.filters ]):
+            continue
+        required = benchmark_requires.get(name, None)
+        if required is not None and not any([ importlib.util.find_spec(r) is not None or shutil.which(r) for r in required ]):
+            print('%-30s skipped, %s not installed' % (name, ' or '.join(required)))
+            continue
+        r = run_benchmark(name, fx, os.path.join(args.dir, 'work'), repeat=max(1, args.repeat))
+        if r is None:
+            print('%-30s failed' % name, file=sys.stderr)
+            failed.append(name)
+            continue
+        results[name] = r
+        line = '%-30s %8.3fs wall (±%.3fs) %8.3fs cpu %8i KiB peak RSS' % (name, r['wall'], r['spread'] / 2, r['cpu'], r['peak_rss_kb'])
+        if 'import_ms' in r:
+            line += ' %7.1fms import' % r['import_ms']
+        b = baseline.get(name, None)
+        if b is not None:
+            line += '  (%+.1f%%)' % ((r['wall'] / max(b['wall'], 1e-9) - 1) * 100)
+        print(line)
+
+    regressions = compare(results, baseline, args.threshold, min_delta=args.min_delta)
+    for name in regressions:
+        print('Regression in %s: %.3fs, baseline %.3fs' % (name, results[name]['wall'], baseline[name]['wall']), file=sys.stderr)
+
+    if args.save:
+        data = {
+            'archive_size': size,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        print('Saved baseline to %s' % args.baseline)
+    return 1 if regressions or failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
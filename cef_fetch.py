@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+#
+# HTTP client of the CEF package updater. It runs on an asyncio event loop
+# in a background thread, so the blocking calls from the package pipeline
+# threads share one pool of keep-alive connections and one set of per-host
+# limits. The module is only imported when something is fetched.
+import sys
+import os
+import re
+import asyncio
+import threading
+import urllib.parse
+import concurrent.futures
+
+# statuses which are retried like connection errors
+retry_statuses = [429, 500, 502, 503, 504]
+redirect_statuses = [301, 302, 303, 307, 308]
+max_redirects = 5
+
+re_range = re.compile(r'bytes=(\d+)-(\d*)$')
+
+class fetch_error(IOError):
+    """A request failed, after all retries. For HTTP errors `status' and
+       `headers' are those of the response.
+    """
+    def __init__(self, url, msg, status=None, headers=None):
+        IOError.__init__(self, '%s: %s' % (url, msg))
+        self.url = url
+        self.status = status
+        self.headers = headers if headers is not None else response_headers()
+
+class response_headers(dict):
+    """Response header fields with case-insensitive names."""
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key.lower(), value)
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, key.lower())
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key.lower())
+
+    def get(self, key, default=None):
+        return dict.get(self, key.lower(), default)
+
+class _connection(object):
+    def __init__(self, key, reader, writer, absolute_target=False):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        # requests through a plain HTTP proxy use the absolute URL
+        self.absolute_target = absolute_target
+        self.reused = False
+
+    def usable(self):
+        return not self.reader.at_eof() and not self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+class http_response(object):
+    """Response of http_fetcher.open(). The body is read with read() from
+       any thread but the one of the event loop. Once it was read
+       completely the connection goes back to the pool; closing the
+       response before drops the connection. A response which is garbage
+       collected without being read or closed drops its connection too.
+    """
+    def __init__(self, fetcher, conn, url, method, status, reason, headers, keep_alive):
+        self._fetcher = fetcher
+        self._conn = conn
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._keep_alive = keep_alive
+        self._chunked = 'chunked' in headers.get('Transfer-Encoding', '').lower()
+        self._chunk_left = 0
+        length = headers.get('Content-Length', None)
+        self._remaining = int(length) if length is not None and not self._chunked else None
+        self._done = method == 'HEAD' or status in [204, 304] or (100 <= status < 200)
+        if self._remaining is None and not self._chunked:
+            # body ends with the connection
+            self._keep_alive = False
+        if self._done:
+            self._finish()
+
+    def _finish(self):
+        self._done = True
+        if self._conn is not None:
+            self._fetcher._release(self._conn, self._keep_alive)
+            self._conn = None
+
+    def _abort(self):
+        self._done = True
+        if self._conn is not None:
+            self._fetcher._release(self._conn, False)
+            self._conn = None
+
+    async def _read(self, n):
+        if self._done:
+            return b''
+        reader = self._conn.reader
+        timeout = self._fetcher.timeout
+        self._fetcher._touch(self._conn.key)
+        try:
+            if self._chunked:
+                if self._chunk_left == 0:
+                    line = await asyncio.wait_for(reader.readline(), timeout)
+                    size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+                    if size == 0:
+                        # trailer fields
+                        while (await asyncio.wait_for(reader.readline(), timeout)).strip():
+                            pass
+                        self._finish()
+                        return b''
+                    self._chunk_left = size
+                data = await asyncio.wait_for(reader.read(min(n, self._chunk_left) if n > 0 else self._chunk_left), timeout)
+                if not data:
+                    raise fetch_error(self.url, 'connection closed in chunked body')
+                self._chunk_left -= len(data)
+                if self._chunk_left == 0:
+                    await asyncio.wait_for(reader.readexactly(2), timeout)
+                return data
+            elif self._remaining is not None:
+                if self._remaining == 0:
+                    self._finish()
+                    return b''
+                data = await asyncio.wait_for(reader.read(min(n, self._remaining) if n > 0 else self._remaining), timeout)
+                if not data:
+                    raise fetch_error(self.url, 'connection closed with %i bytes missing' % self._remaining)
+                self._remaining -= len(data)
+                if self._remaining == 0:
+                    self._finish()
+                return data
+            else:
+                data = await asyncio.wait_for(reader.read(n if n > 0 else 1024*1024), timeout)
+                if not data:
+                    self._finish()
+                return data
+        except fetch_error:
+            self._abort()
+            raise
+        except asyncio.TimeoutError:
+            self._abort()
+            raise fetch_error(self.url, 'timed out reading the response')
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            self._abort()
+            raise fetch_error(self.url, 'error reading the response: %s' % e)
+
+    def read(self, n=-1):
+        """Read up to `n' bytes of the body, or all of it for n < 0.
+           Returns b'' at the end of the body.
+        """
+        if n is not None and n >= 0:
+            return self._fetcher._call(self._read(n))
+        ret = []
+        while True:
+            data = self._fetcher._call(self._read(1024*1024))
+            if not data:
+                break
+            ret.append(data)
+        return b''.join(ret)
+
+    def close(self):
+        if not self._done:
+            self._fetcher._call_soon(self._abort)
+
+    def __del__(self):
+        # the connection still holds one of the per-host slots
+        if not self._done and self._conn is not None:
+            self._fetcher._call_if_running(self._abort)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class file_response(object):
+    """Response for a file:// URL, e.g. a local mirror. It supports the
+       parts of HTTP the updater uses: Range requests (206/416) and
+       If-Modified-Since (304).
+    """
+    def __init__(self, url, headers, method):
+        import urllib.request
+        import email.utils
+        self.url = url
+        self.reason = ''
+        self.headers = response_headers()
+        path = urllib.request.url2pathname(urllib.parse.urlsplit(url).path)
+        try:
+            st = os.stat(path)
+            self._file = open(path, 'rb') if method != 'HEAD' else None
+        except OSError as e:
+            raise fetch_error(url, e.strerror, status=404)
+        size = st.st_size
+        last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        self.headers['Last-Modified'] = last_modified
+        self._remaining = size
+        self.status = 200
+        request_headers = dict((k.lower(), v) for (k, v) in headers.items())
+        m = re_range.match(request_headers.get('range', ''))
+        if m is not None:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            if start >= size:
+                self.close()
+                h = response_headers()
+                h['Content-Range'] = 'bytes */%i' % size
+                raise fetch_error(url, 'range not satisfiable', status=416, headers=h)
+            if self._file is not None:
+                self._file.seek(start)
+            self._remaining = end + 1 - start
+            self.status = 206
+            self.headers['Content-Range'] = 'bytes %i-%i/%i' % (start, end, size)
+        elif request_headers.get('if-modified-since', None) == last_modified:
+            self.status = 304
+            self._remaining = 0
+        self.headers['Content-Length'] = str(self._remaining)
+
+    def read(self, n=-1):
+        if self._file is None or self._remaining <= 0:
+            return b''
+        data = self._file.read(min(n, self._remaining) if n is not None and n >= 0 else self._remaining)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class http_fetcher(object):
+    """HTTP/1.1 client with a pool of keep-alive connections per host.
+       At most `per_host' requests to the same host run at the same time,
+       every network operation is bounded by `timeout' seconds (waiting for
+       a free connection only fails if none of the running requests to the
+       host made progress in that time), and
+       connection errors, timeouts and 429/5xx responses are retried up
+       to `retries' times with exponential backoff starting at `backoff'
+       seconds. Redirects are followed and proxies from the environment
+       are used. file:// URLs are read directly.
+
+       The event loop is started on first use. open() and fetch() block
+       the calling thread; submit() returns a concurrent.futures.Future,
+       so several requests can be in flight from one thread.
+    """
+    def __init__(self, per_host=4, timeout=60, retries=3, backoff=1.0, verbose=False):
+        self.configure(per_host=per_host, timeout=timeout, retries=retries, backoff=backoff, verbose=verbose)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._idle = {}
+        self._limits = {}
+        self._activity = {}
+        self._ssl_context = None
+
+    def configure(self, per_host=None, timeout=None, retries=None, backoff=None, verbose=None):
+        if per_host is not None:
+            self.per_host = max(1, per_host)
+        if timeout is not None:
+            self.timeout = timeout
+        if retries is not None:
+            self.retries = max(0, retries)
+        if backoff is not None:
+            self.backoff = backoff
+        if verbose is not None:
+            self.verbose = verbose
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='http_fetcher', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._start()).result()
+
+    def _call_soon(self, func):
+        self._start().call_soon_threadsafe(func)
+
+    def _call_if_running(self, func):
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(func)
+            except RuntimeError:
+                # the loop was closed in the meantime
+                pass
+
+    def close(self):
+        """Close the idle connections and stop the event loop."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        def _stop():
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle = {}
+            self._limits = {}
+            self._activity = {}
+            loop.stop()
+        loop.call_soon_threadsafe(_stop)
+        self._thread.join()
+        loop.close()
+
+    def _limit(self, key):
+        sem = self._limits.get(key, None)
+        if sem is None:
+            sem = self._limits[key] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    @staticmethod
+    def _limit_key(conn_key):
+        return conn_key[:2] if conn_key[0] != 'proxy' else conn_key[1:3]
+
+    def _touch(self, conn_key):
+        self._activity[self._limit_key(conn_key)] = asyncio.get_running_loop().time()
+
+    async def _acquire(self, key):
+        """Wait for one of the `per_host' slots of `key'. Slow downloads may
+           hold all of them for a long time, so this only fails if no
+           request to the host made progress within `timeout' seconds,
+           e.g. because their responses were neither read nor closed.
+        """
+        limit = self._limit(key)
+        while True:
+            start = asyncio.get_running_loop().time()
+            try:
+                await asyncio.wait_for(limit.acquire(), self.timeout)
+                return limit
+            except asyncio.TimeoutError:
+                if self._activity.get(key, 0) < start:
+                    raise OSError('no connection to %s available for %ss' % (key[1], self.timeout))
+
+    def _release(self, conn, keep_alive):
+        if keep_alive and conn.usable():
+            conn.reused = True
+            self._idle.setdefault(conn.key, []).append(conn)
+        else:
+            conn.close()
+        self._touch(conn.key)
+        self._limit(self._limit_key(conn.key)).release()
+
+    def _proxy(self, scheme, host):
+        import urllib.request
+        proxies = urllib.request.getproxies()
+        proxy = proxies.get(scheme, None)
+        if proxy is None or urllib.request.proxy_bypass(host):
+            return None
+        return urllib.parse.urlsplit(proxy)
+
+    def _get_ssl_context(self):
+        if self._ssl_context is None:
+            import ssl
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    async def _connect(self, scheme, host, port):
+        proxy = self._proxy(scheme, host)
+        ssl_context = self._get_ssl_context() if scheme == 'https' else None
+        if proxy is None:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context, server_hostname=host if ssl_context else None), self.timeout)
+            return _connection((scheme, host, port), reader, writer)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(proxy.hostname, proxy.port or 80), self.timeout)
+        if ssl_context is None:
+            return _connection(('proxy', scheme, host, port), reader, writer, absolute_target=True)
+        target = '%s:%i' % (host, port)
+        writer.write(('CONNECT %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (target, target)).encode('ascii'))
+        status, reason, headers = await self._read_head(reader)
+        if status != 200:
+            writer.close()
+            raise fetch_error(target, 'proxy refused CONNECT: %i %s' % (status, reason), status=status, headers=headers)
+        await asyncio.wait_for(writer.start_tls(ssl_context, server_hostname=host), self.timeout)
+        return _connection(('proxy', scheme, host, port), reader, writer)
+
+    async def _read_head(self, reader):
+        data = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.timeout)
+        lines = data.decode('iso-8859-1').split('\r\n')
+        version, _, rest = lines[0].partition(' ')
+        code, _, reason = rest.partition(' ')
+        if not version.startswith('HTTP/') or not code.isdigit():
+            raise ValueError('invalid status line %r' % lines[0])
+        headers = response_headers()
+        headers['HTTP-Version'] = version
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(':')
+            name = name.strip()
+            value = value.strip()
+            if name in headers:
+                value = headers[name] + ', ' + value
+            headers[name] = value
+        return int(code), reason, headers
+
+    async def _request_once(self, method, url, headers):
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ['http', 'https']:
+            raise fetch_error(url, 'unsupported URL scheme %s' % scheme)
+        host = parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        limit = await self._acquire((scheme, host))
+        try:
+            while True:
+                conn = None
+                for key in [(scheme, host, port), ('proxy', scheme, host, port)]:
+                    idle = self._idle.get(key, [])
+                    while idle and conn is None:
+                        c = idle.pop()
+                        if c.usable():
+                            conn = c
+                        else:
+                            c.close()
+                if conn is None:
+                    conn = await self._connect(scheme, host, port)
+                target = url if conn.absolute_target else urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+                lines = ['%s %s HTTP/1.1' % (method, target), 'Host: %s' % parts.netloc.rpartition('@')[2]]
+                for name, value in headers.items():
+                    lines.append('%s: %s' % (name, value))
+                lines.append('Connection: keep-alive')
+                try:
+                    conn.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('iso-8859-1'))
+                    await asyncio.wait_for(conn.writer.drain(), self.timeout)
+                    status, reason, resp_headers = await self._read_head(conn.reader)
+                except (OSError, asyncio.IncompleteReadError):
+                    conn.close()
+                    if conn.reused:
+                        # the server closed the idle connection, use a new one
+                        continue
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                break
+        except BaseException:
+            limit.release()
+            raise
+        connection = resp_headers.get('Connection', '').lower()
+        keep_alive = 'close' not in connection and (resp_headers.get('HTTP-Version') != 'HTTP/1.0' or 'keep-alive' in connection)
+        return http_response(self, conn, url, method, status, reason, resp_headers, keep_alive)
+
+    async def _open(self, url, headers, method):
+        redirects = 0
+        while True:
+            delay = self.backoff
+            attempt = 0
+            while True:
+                try:
+                    resp = await self._request_once(method, url, headers)
+                    error = None
+                    if resp.status in retry_statuses:
+                        error = fetch_error(url, 'HTTP Error %i: %s' % (resp.status, resp.reason), status=resp.status, headers=resp.headers)
+                except fetch_error:
+                    raise
+                except asyncio.TimeoutError:
+                    resp = None
+                    error = fetch_error(url, 'timed out')
+                except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+                    resp = None
+                    error = fetch_error(url, str(e) or e.__class__.__name__)
+                if error is None or attempt >= self.retries:
+                    if resp is None:
+                        raise error
+                    break
+                if resp is not None:
+                    retry_after = resp.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, min(int(retry_after), 60))
+                    resp._abort()
+                attempt += 1
+                if self.verbose:
+                    print('%s, retry %i/%i in %.1fs' % (error, attempt, self.retries, delay), file=sys.stderr)
+                await asyncio.sleep(delay)
+                delay *= 2
+            location = resp.headers.get('Location', None)
+            if resp.status not in redirect_statuses or location is None:
+                return resp
+            resp._abort()
+            redirects += 1
+            if redirects > max_redirects:
+                raise fetch_error(url, 'too many redirects')
+            url = urllib.parse.urljoin(url, location)
+            if resp.status == 303 and method != 'HEAD':
+                method = 'GET'
+
+    def open(self, url, headers={}, method='GET'):
+        """Send a request and return the http_response once the header
+           arrived. Raises fetch_error if the request failed or the
+           response has an error status (>= 400).
+        """
+        if url.startswith('file:'):
+            return file_response(url, headers, method)
+        resp = self._call(self._open(url, headers, method))
+        if resp.status >= 400:
+            resp.close()
+            raise fetch_error(url, 'HTTP Error %i: %s' % (resp.status, resp.reason), status=resp.status, headers=resp.headers)
+        return resp
+
+    async def _fetch(self, url, headers, method, max_size):
+        resp = await self._open(url, headers, method)
+        body = []
+        size = 0
+        while max_size is None or size < max_size:
+            data = await resp._read(1024*1024 if max_size is None else max_size - size)
+            if not data:
+                break
+            body.append(data)
+            size += len(data)
+        if not resp._done:
+            resp._abort()
+        if resp.status >= 400:
+            raise fetch_error(url, 'HTTP Error %i: %s' % (resp.status, resp.reason), status=resp.status, headers=resp.headers)
+        return resp.status, resp.headers, b''.join(body)
+
+    def submit(self, url, headers={}, method='GET', max_size=None):
+        """Start a request in the background and return a Future with
+           (status, headers, body); at most `max_size' bytes of the body
+           are read. The Future raises fetch_error on failure.
+        """
+        if url.startswith('file:'):
+            future = concurrent.futures.Future()
+            try:
+                with file_response(url, headers, method) as resp:
+                    future.set_result( (resp.status, resp.headers, resp.read(max_size if max_size is not None else -1)) )
+            except fetch_error as e:
+                future.set_exception(e)
+            return future
+        return asyncio.run_coroutine_threadsafe(self._fetch(url, headers, method, max_size), self._start())
+
+    def fetch(self, url, headers={}, method='GET', max_size=None):
+        return self.submit(url, headers=headers, method=method, max_size=max_size).result()
+
+# shared client of the updater, configured by the command line
+http_client = http_fetcher()
@@ -0,0 +1,3165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import sys
+import argparse
+import urllib.parse
+import errno
+import shutil
+import re
+import os
+import os.path
+import copy
+import fnmatch
+import filecmp
+import collections
+import tarfile
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+import threading
+import time
+import json
+import hashlib
+import codecs
+# modules only needed by some commands (the HTTP client in cef_fetch, zipfile,
+# subprocess, concurrent.futures, html, debian and arsoft) are imported where
+# they are used, so --list and no-op runs start quickly
+
+
+
+# Optional package settings:
+#   extract-include:  globs (relative to the archive top directory) of the
+#                     files to extract, instead of the whole archive
+#   extract-packages: binary packages (debian/<name>.install) whose files
+#                     are extracted, e.g. ['libcef${cef:ABI}', 'libcef${cef:ABI}-dev']
+#                     The files the cmake install target always installs
+#                     (cmake_install_globs) are extracted as well; Debug/
+#                     only with libcefd${cef:ABI}.
+#   platforms:        CEF platforms to build (default: the platform of the site)
+#   flavours:         distributions to build, see cef_flavours and
+#                     cef_packaged_flavours (default: ['standard'])
+#
+# Every package is expanded into one build job per platform and flavour.
+# The job of the site platform and the standard flavour is prepared in
+# repo/<name> as source package cef<version>; the other jobs are prepared
+# in repo/<arch>/<name> or repo/<arch>-<flavour>/<name> as source package
+# cef<version>-<arch> or cef<version>-<arch>-<flavour>, so each of them
+# has its own orig archive.
+package_list = {
+    'cef-78': {
+        'version': 78,
+        'site': 'spotify',
+    },
+    'cef-79': {
+        'version': 79,
+        'site': 'spotify',
+        'disable': True,
+    },
+    }
+
+
+# Optional site settings:
+#   mirror: URL or local directory of a mirror created with --sync-mirror
+#           (<dir>/<site>); the index and the archives are read from there
+#           instead of the upstream site
+site_list = {
+    #http://opensource.spotify.com/cefbuilds/cef_binary_79.0.10%2Bge866a07%2Bchromium-79.0.3945.88_linux64.tar.bz2
+    'spotify': {
+        'archive': 'tar.bz2',
+        'platform': 'linux64',
+        'index': 'http://opensource.spotify.com/cefbuilds/index.html',
+        'download': 'http://opensource.spotify.com/cefbuilds/cef_binary_${last_build}_${platform}${flavour}.${archive}',
+    },
+}
+
+# debian architecture of the CEF platforms (see CEF_ARCH in debian/rules)
+cef_platform_arch = {
+    'linux32': 'i386',
+    'linux64': 'amd64',
+    'linuxarm': 'armhf',
+    'linuxarm64': 'arm64',
+}
+
+# archive name suffix of the distributions in the cefbuilds index
+cef_flavours = {
+    'standard': '',
+    'minimal': '_minimal',
+    'client': '_client',
+}
+
+# distributions the debian/ templates can package; the minimal and client
+# distributions lack the Debug/ tree (client also cmake/ and libcef_dll/)
+# and would build the same binary package names as the standard one
+cef_packaged_flavours = ['standard']
+
+class trace_span(object):
+    """A timed section of a run, see tracer.span()."""
+    def __init__(self, tracer, name, args):
+        self._tracer = tracer
+        self.name = name
+        self.args = args
+        self.counters = {}
+
+    def add(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        self._tracer._stack().append(self)
+        self.start = time.time()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.time() - self.start
+        self.cpu = time.thread_time() - self._cpu_start
+        self._tracer._stack().pop()
+        if exc_type is not None:
+            self.args['error'] = str(exc_value)
+        self._tracer._finish(self)
+        return False
+
+class tracer(object):
+    """Records spans with their wall and CPU time, byte/file counters and
+       the peak RSS of the process (and its child processes) at their end.
+       write() stores them as JSON lines, or as a Chrome trace (for
+       chrome://tracing or Perfetto) if the file name ends with .json.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans = []
+        self._start = time.time()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **args):
+        return trace_span(self, name, args)
+
+    def count(self, key, value=1):
+        """Add `value' to counter `key' of the innermost span of this thread."""
+        stack = self._stack()
+        if stack:
+            stack[-1].add(key, value)
+
+    @staticmethod
+    def _peak_rss():
+        try:
+            import resource
+        except ImportError:
+            return None, None
+        # ru_maxrss is in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    def _finish(self, span):
+        span.peak_rss, span.peak_rss_children = self._peak_rss()
+        span.thread = threading.get_ident()
+        with self._lock:
+            self._spans.append(span)
+
+    def _records(self):
+        for span in sorted(self._spans, key=lambda s: s.start):
+            yield {
+                'name': span.name,
+                'args': span.args,
+                'start': round(span.start - self._start, 6),
+                'duration': round(span.duration, 6),
+                'cpu': round(span.cpu, 6),
+                'counters': span.counters,
+                'peak_rss_kb': span.peak_rss,
+                'peak_rss_children_kb': span.peak_rss_children,
+                'thread': span.thread,
+            }
+
+    def write(self, filename):
+        with self._lock:
+            records = list(self._records())
+        tmp = filename + '.tmp'
+        with open(tmp, 'w') as f:
+            if filename.endswith('.json'):
+                events = []
+                for r in records:
+                    args = dict(r['args'])
+                    args.update(r['counters'])
+                    args['cpu_s'] = r['cpu']
+                    args['peak_rss_kb'] = r['peak_rss_kb']
+                    events.append({ 'name': r['name'], 'cat': 'cef', 'ph': 'X', 'pid': os.getpid(), 'tid': r['thread'],
+                                    'ts': int(r['start'] * 1000000), 'dur': int(r['duration'] * 1000000), 'args': args })
+                    if r['peak_rss_kb'] is not None:
+                        events.append({ 'name': 'peak RSS', 'ph': 'C', 'pid': os.getpid(),
+                                        'ts': int((r['start'] + r['duration']) * 1000000),
+                                        'args': { 'self_kb': r['peak_rss_kb'], 'children_kb': r['peak_rss_children_kb'] } })
+                json.dump({ 'traceEvents': events, 'displayTimeUnit': 'ms' }, f)
+            else:
+                for r in records:
+                    f.write(json.dumps(r, sort_keys=True) + '\n')
+        os.replace(tmp, filename)
+
+# spans and counters of the current run, written by --trace
+trace = tracer()
+
+def mkdir_p(path):
+    try:
+        os.makedirs(path)
+    except OSError as exc:  # Python >2.5
+        if exc.errno == errno.EEXIST and os.path.isdir(path):
+            pass
+        else:
+            raise
+
+def rmdir_p(path):
+    return shutil.rmtree(path, ignore_errors=False, onerror=None)
+
+# ioctl to share the extents of a file on btrfs/XFS (linux/fs.h)
+FICLONE = 0x40049409
+
+def copy_file_fast(src, dst, allow_hardlink=False):
+    """Copy the content and metadata of file `src' to `dst' like
+       shutil.copy2, using the cheapest strategy the file systems support:
+       a hardlink (only if `allow_hardlink' and both are on the same file
+       system), a FICLONE reflink, os.copy_file_range, os.sendfile and
+       finally a buffered copy. Returns the name of the used strategy.
+       Raises shutil.SameFileError if `src' and `dst' are the same file,
+       unless `allow_hardlink' and `dst' is already a hardlink of `src'.
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        if allow_hardlink and os.path.abspath(src) != os.path.abspath(dst):
+            return 'hardlink'
+        raise shutil.SameFileError('%s and %s are the same file' % (src, dst))
+
+    if allow_hardlink:
+        try:
+            if os.stat(src).st_dev == os.stat(os.path.dirname(os.path.abspath(dst))).st_dev:
+                if os.path.lexists(dst):
+                    os.unlink(dst)
+                os.link(src, dst)
+                return 'hardlink'
+        except OSError:
+            pass
+
+    strategy = None
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        size = os.fstat(src_fd).st_size
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                strategy = 'reflink'
+            except OSError:
+                pass
+        for (name, func) in [ ('copy_file_range', getattr(os, 'copy_file_range', None)),
+                              ('sendfile', getattr(os, 'sendfile', None)) ]:
+            if strategy is not None or func is None:
+                continue
+            offset = 0
+            try:
+                while offset < size:
+                    if name == 'sendfile':
+                        n = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                    else:
+                        n = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+                    if n == 0:
+                        break
+                    offset += n
+                if offset == size:
+                    strategy = name
+            except OSError:
+                pass
+            if strategy is None:
+                os.ftruncate(dst_fd, 0)
+        if strategy is None:
+            fsrc.seek(0)
+            fdst.seek(0)
+            shutil.copyfileobj(fsrc, fdst, 1024*1024)
+            strategy = 'buffered'
+    shutil.copystat(src, dst)
+    return strategy
+
+class fast_copy_function(object):
+    """copy_function for copytree which copies with copy_file_fast and
+       records the strategy used for each destination file in `strategies'.
+    """
+    def __init__(self, allow_hardlink=False):
+        self.allow_hardlink = allow_hardlink
+        self.strategies = {}
+
+    def __call__(self, src, dst):
+        self.strategies[dst] = copy_file_fast(src, dst, allow_hardlink=self.allow_hardlink)
+        return dst
+
+    def summary(self):
+        return collections.Counter(self.strategies.values())
+
+def copytree(src, dst, symlinks=False, ignore=None, copy_function=None,
+             ignore_dangling_symlinks=False, ignore_existing_dst=False):
+    """Copy a directory tree.
+
+    The destination directory must not already exist.
+    If exception(s) occur, an Error is raised with a list of reasons.
+
+    If the optional symlinks flag is true, symbolic links in the
+    source tree result in symbolic links in the destination tree; if
+    it is false, the contents of the files pointed to by symbolic
+    links are copied. If the file pointed by the symlink doesn't
+    exist, an exception will be added in the list of errors raised in
+    an Error exception at the end of the copy process.
+
+    You can set the optional ignore_dangling_symlinks flag to true if you
+    want to silence this exception. Notice that this has no effect on
+    platforms that don't support os.symlink.
+
+    The optional ignore argument is a callable. If given, it
+    is called with the `src` parameter, which is the directory
+    being visited by copytree(), and `names` which is the list of
+    `src` contents, as returned by os.listdir():
+
+        callable(src, names) -> ignored_names
+
+    The callable is called once for each directory that is copied.
+    It returns a list of names relative to the `src` directory that
+    should not be copied.
+
+    The optional copy_function argument is a callable that will be used
+    to copy each file. It will be called with the source path and the
+    destination path as arguments. By default, a fast_copy_function is
+    used, but any function that supports the same signature (like copy()
+    or copy2()) can be used.
+
+    The tree is walked iteratively with os.scandir, so deep trees do not
+    hit the recursion limit; the directory attributes are set once all
+    files of the tree are copied.
+
+    """
+    if copy_function is None:
+        copy_function = fast_copy_function()
+
+    errors = []
+    directories = []
+    stack = [(src, dst, True)]
+    while stack:
+        (srcdir, dstdir, is_top) = stack.pop()
+        try:
+            with os.scandir(srcdir) as it:
+                entries = list(it)
+            if ignore_existing_dst:
+                mkdir_p(dstdir)
+            else:
+                os.makedirs(dstdir)
+        except OSError as why:
+            if is_top:
+                raise
+            errors.append((srcdir, dstdir, str(why)))
+            continue
+        directories.append((srcdir, dstdir))
+
+        if ignore is not None:
+            ignored_names = ignore(srcdir, [ e.name for e in entries ])
+        else:
+            ignored_names = set()
+
+        for entry in entries:
+            if entry.name in ignored_names:
+                continue
+            srcname = entry.path
+            dstname = os.path.join(dstdir, entry.name)
+            try:
+                if entry.is_symlink():
+                    linkto = os.readlink(srcname)
+                    if symlinks:
+                        # We can't just leave it to `copy_function` because legacy
+                        # code with a custom `copy_function` may rely on copytree
+                        # doing the right thing.
+                        os.symlink(linkto, dstname)
+                        shutil.copystat(srcname, dstname, follow_symlinks=not symlinks)
+                        continue
+                    # ignore dangling symlink if the flag is on
+                    if not os.path.exists(linkto) and ignore_dangling_symlinks:
+                        continue
+                    # otherwise let the copy occurs. copy2 will raise an error
+                    if entry.is_dir():
+                        stack.append((srcname, dstname, False))
+                        continue
+                elif entry.is_dir(follow_symlinks=False):
+                    stack.append((srcname, dstname, False))
+                    continue
+            except OSError as why:
+                errors.append((srcname, dstname, str(why)))
+                continue
+            # Will raise a SpecialFileError for unsupported file types
+            try:
+                copy_function(srcname, dstname)
+            except shutil.Error as err:
+                errors.extend(err.args[0])
+            except OSError as why:
+                errors.append((srcname, dstname, str(why)))
+
+    # set the directory attributes, deepest directories first
+    for (srcdir, dstdir) in reversed(directories):
+        try:
+            shutil.copystat(srcdir, dstdir)
+        except OSError as why:
+            # Copying file access times may fail on Windows
+            if getattr(why, 'winerror', None) is None:
+                errors.append((srcdir, dstdir, str(why)))
+    if errors:
+        raise shutil.Error(errors)
+    return dst
+
+def remove_obsolete_files(src, dst, ignore=None, verbose=True):
+    """Remove all entries below `dst' which do not exist below `src',
+       except the ones matched by `ignore'. Both trees are walked
+       iteratively with one os.scandir per directory.
+    """
+    errors = []
+    stack = [(src, dst)]
+    while stack:
+        (srcdir, dstdir) = stack.pop()
+        try:
+            with os.scandir(dstdir) as it:
+                entries = list(it)
+            try:
+                with os.scandir(srcdir) as it:
+                    src_entries = dict([ (e.name, e) for e in it ])
+            except (FileNotFoundError, NotADirectoryError):
+                src_entries = {}
+        except OSError as why:
+            errors.append((srcdir, dstdir, str(why)))
+            continue
+
+        if ignore is not None:
+            ignored_names = ignore(dstdir, [ e.name for e in entries ])
+        else:
+            ignored_names = set()
+
+        for entry in entries:
+            if entry.name in ignored_names:
+                continue
+            srcname = os.path.join(srcdir, entry.name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                src_entry = src_entries.get(entry.name, None)
+                if src_entry is not None and (not src_entry.is_symlink() or os.path.exists(srcname)):
+                    if is_dir:
+                        stack.append((srcname, entry.path))
+                    continue
+            except OSError as why:
+                errors.append((srcname, entry.path, str(why)))
+                continue
+            if verbose:
+                print('remove %s' % entry.path)
+            try:
+                if is_dir:
+                    rmdir_p(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except shutil.Error as err:
+                errors.extend(err.args[0])
+            except OSError as why:
+                errors.append((srcname, entry.path, str(why)))
+    if errors:
+        raise shutil.Error(errors)
+    return dst
+
+def scan_tree(root, ignore=None):
+    """Returns a dict which maps the path of every entry below `root'
+       (relative to `root') to a (kind, size, mtime_ns) tuple, where kind
+       is 'd' or 'f'. Each directory is read with a single os.scandir
+       pass and the stat results of the DirEntry objects are reused.
+    """
+    ret = {}
+    if not os.path.isdir(root):
+        return ret
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        full_dir = os.path.join(root, rel_dir)
+        with os.scandir(full_dir) as it:
+            entries = list(it)
+        ignored_names = ignore(full_dir, [ e.name for e in entries ]) if ignore is not None else set()
+        for e in entries:
+            if e.name in ignored_names:
+                continue
+            rel = os.path.join(rel_dir, e.name)
+            if e.is_dir():
+                ret[rel] = ('d', 0, 0)
+                stack.append(rel)
+            else:
+                st = e.stat()
+                ret[rel] = ('f', st.st_size, st.st_mtime_ns)
+    return ret
+
+def copy_and_overwrite(from_path, to_path):
+    ret = False
+    try:
+        copytree(from_path, to_path, ignore_existing_dst=True)
+        ret = True
+    except shutil.Error as e:
+        print('Copy failed: %s' % e, file=sys.stderr)
+
+    remove_obsolete_files(from_path, to_path, ignore=shutil.ignore_patterns('debian', '.pc', '.git*'))
+    return ret
+
+def substVars(val, props, empty_vars=True):
+
+    DELIM_START = "${";
+    DELIM_STOP = "}"
+    DELIM_START_LEN = len(DELIM_START)
+    DELIM_STOP_LEN = len(DELIM_STOP)
+    changed = False
+    pattern = val
+    i = 0
+
+    while True:
+        # Find opening paren of variable substitution.
+        var_start = pattern.find(DELIM_START, i);
+        if var_start < 0:
+            dest = pattern;
+            return changed, dest;
+
+        # Find closing paren of variable substitution.
+        var_end = pattern.find(DELIM_STOP, var_start);
+        if var_end < 0:
+            return False;
+
+        key = pattern[var_start + DELIM_START_LEN: var_end]
+        replacement = ''
+
+        if key and key in props:
+            replacement = str(props[key])
+
+        if empty_vars or replacement:
+            # Substitute the variable with its value in place.
+            pattern = pattern[0:var_start] + replacement + pattern[var_end+DELIM_STOP_LEN:]
+            changed = True
+            # Move beyond the just substituted part.
+            i = var_start + len(replacement)
+        else:
+            # Nothing has been substituted, just move beyond the unexpanded variable.
+            i = var_end + DELIM_STOP_LEN
+    return changed, pattern
+
+re_template_var = re.compile(r'\$\{([^}\n]*)\}')
+
+class compiled_template(object):
+    """A template file split once into literal and variable segments.
+
+       `${name}' is replaced by the value of `name'; variables without a
+       (non-empty) value are kept as they are, since the debian/ files
+       also contain make, cmake and dh-exec variables. `${$}' renders a
+       single `$', so `${$}{name}' produces a literal `${name}'.
+    """
+    def __init__(self, data, encoding='utf-8'):
+        self.encoding = encoding
+        self.variables = set()
+        self._segments = []
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError:
+            # not a text file, copied unchanged
+            self.raw = data
+            return
+        self.raw = None
+        pos = 0
+        for m in re_template_var.finditer(text):
+            if m.start() > pos:
+                self._segments.append( (False, text[pos:m.start()]) )
+            key = m.group(1)
+            if key == '$':
+                self._segments.append( (False, '$') )
+            else:
+                self._segments.append( (True, key) )
+                self.variables.add(key)
+            pos = m.end()
+        if pos < len(text):
+            self._segments.append( (False, text[pos:]) )
+
+    def render(self, values):
+        """Returns the rendered data and the set of unknown variables."""
+        if self.raw is not None:
+            return self.raw, set()
+        parts = []
+        unknown = set()
+        for (is_var, text) in self._segments:
+            if is_var:
+                replacement = str(values[text]) if text and text in values else ''
+                if replacement:
+                    parts.append(replacement)
+                else:
+                    unknown.add(text)
+                    parts.append('${' + text + '}')
+            else:
+                parts.append(text)
+        return ''.join(parts).encode(self.encoding), unknown
+
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+
+def load_template(filename, encoding='utf-8'):
+    """Returns the compiled_template of `filename', cached by path, size
+       and modification time.
+    """
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), encoding)
+    with _template_cache_lock:
+        cached = _template_cache.get(key, None)
+        if cached is not None and cached[0] == (st.st_size, st.st_mtime_ns):
+            return cached[1]
+    with open(filename, 'rb') as f:
+        tmpl = compiled_template(f.read(), encoding=encoding)
+    with _template_cache_lock:
+        _template_cache[key] = ((st.st_size, st.st_mtime_ns), tmpl)
+    return tmpl
+
+def write_if_changed(dst, data):
+    """Atomically replace `dst' with `data' unless it already has exactly
+       this content. Returns True if the file was written.
+    """
+    try:
+        if os.path.getsize(dst) == len(data):
+            with open(dst, 'rb') as f:
+                if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                    return False
+    except OSError:
+        pass
+    tmp = os.path.join(os.path.dirname(dst), '.' + os.path.basename(dst) + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, dst)
+    return True
+
+def configure_file(src, dst, values={}, follow_symlinks=True, encoding='utf-8', verbose=False):
+    """Render the template `src' to `dst'; `dst' is only replaced if the
+       output differs. Returns True if `dst' was written.
+    """
+    if not follow_symlinks and os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return True
+    data, unknown = load_template(src, encoding=encoding).render(values)
+    if verbose and unknown:
+        print('%s: unknown variables %s' % (src, ', '.join(sorted(unknown))))
+    return write_if_changed(dst, data)
+
+# files of the debian/ template tree (globs relative to its root) which are
+# always (True) or never (False) rendered; all other files are rendered
+# unless is_binary_file detects binary content
+configure_file_rules = [
+    ('patches/*', False),
+    ('source/*', False),
+    ('control', True),
+    ('*.install', True),
+    ('*.links', True),
+    ('*README.Debian', True),
+]
+
+def is_binary_file(filename, block_size=8192):
+    """Returns True if the first block of `filename' contains NUL bytes or
+       is not valid UTF-8.
+    """
+    with open(filename, 'rb') as f:
+        block = f.read(block_size)
+    if b'\0' in block:
+        return True
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(block, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+def copy_and_configure(from_path, to_path, values={}, ignore=None, manifest_file=None, verbose=False):
+    """Render the template tree `from_path' into `to_path'. Only outputs
+       whose content changed are written (atomically). If `manifest_file'
+       is given, the source and output stat of every file is recorded
+       there, so files whose template, values and output are unchanged
+       are skipped without rendering them again.
+    """
+    manifest = {}
+    if manifest_file is not None:
+        try:
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            manifest = {}
+    values_key = hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    new_manifest = {}
+    stats = { 'written': 0, 'unchanged': 0 }
+
+    class _copy_and_configure:
+        def __init__(self, values):
+            self.values = values
+
+        def _render(self, src):
+            rel = os.path.relpath(src, from_path)
+            for (pattern, render) in configure_file_rules:
+                if fnmatch.fnmatch(rel, pattern):
+                    return render
+            return not is_binary_file(src)
+
+        def __call__(self, src, dst):
+            dstdir, dstbase = os.path.split(dst)
+            dstchanged, dstbase = substVars(dstbase, props=values)
+            if dstchanged:
+                dst = os.path.join(dstdir, dstbase)
+
+            rel = os.path.relpath(dst, to_path)
+            src_st = os.stat(src)
+            try:
+                dst_st = os.stat(dst)
+            except OSError:
+                dst_st = None
+            entry = manifest.get(rel, None)
+            if entry is not None and dst_st is not None and entry.get('values') == values_key and \
+                    entry.get('src') == [src_st.st_size, src_st.st_mtime_ns] and \
+                    entry.get('dst') == [dst_st.st_size, dst_st.st_mtime_ns]:
+                new_manifest[rel] = entry
+                stats['unchanged'] += 1
+                return
+
+            if self._render(src):
+                written = configure_file(src, dst, values=self.values, verbose=verbose)
+            elif dst_st is not None and dst_st.st_size == src_st.st_size and \
+                    (dst_st.st_mtime_ns == src_st.st_mtime_ns or filecmp.cmp(src, dst, shallow=False)):
+                written = False
+            else:
+                copy_file_fast(src, dst)
+                written = True
+            if written:
+                shutil.copystat(src, dst)
+                stats['written'] += 1
+                if verbose:
+                    print('Update %s' % dst)
+            else:
+                stats['unchanged'] += 1
+            dst_st = os.stat(dst)
+            new_manifest[rel] = {
+                'values': values_key,
+                'src': [src_st.st_size, src_st.st_mtime_ns],
+                'dst': [dst_st.st_size, dst_st.st_mtime_ns],
+            }
+    ret = False
+    try:
+        func = _copy_and_configure(values)
+        copytree(from_path, to_path, copy_function=func, ignore_existing_dst=True, ignore=ignore)
+        ret = True
+    except shutil.Error as e:
+        print('Copy failed: %s' % e, file=sys.stderr)
+    if manifest_file is not None:
+        tmp = manifest_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(new_manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, manifest_file)
+    trace.count('files', stats['written'])
+    trace.count('files_unchanged', stats['unchanged'])
+    if verbose:
+        print('%s: %i files written, %i unchanged' % (to_path, stats['written'], stats['unchanged']))
+    return ret
+
+def copyfile(src, dst, allow_hardlink=False, verbose=False):
+    ret = False
+    try:
+        strategy = copy_file_fast(src, dst, allow_hardlink=allow_hardlink)
+        if verbose:
+            print('Copied %s to %s (%s)' % (src, dst, strategy))
+        ret = True
+    except (shutil.Error, OSError) as e:
+        print('Copy failed: %s' % e, file=sys.stderr)
+    return ret
+
+class MyTarFile(tarfile.TarFile):
+    # files up to this size are handed to the writer threads of
+    # extract_all_to, larger ones are written by the reading thread
+    parallel_max_file_size = 16*1024*1024
+    # limit of file data read ahead for the writer threads
+    parallel_max_pending = 256*1024*1024
+
+    @staticmethod
+    def _target_path(name, path, prefix):
+        if prefix is None:
+            return os.path.join(path, name)
+        tname = name[len(prefix):]
+        if tname and tname[0] == '/':
+            tname = tname[1:]
+        return os.path.join(path, tname)
+
+    def extract(self, member, path="", set_attrs=True, *, numeric_owner=False, prefix=None):
+        """Extract a member from the archive to the current working directory,
+           using its full name. Its file information is extracted as accurately
+           as possible. `member' may be a filename or a TarInfo object. You can
+           specify a different directory using `path'. File attributes (owner,
+           mtime, mode) are set unless `set_attrs' is False. If `numeric_owner`
+           is True, only the numbers for user/group names are used and not
+           the names.
+        """
+        self._check("r")
+
+        if isinstance(member, str):
+            tarinfo = self.getmember(member)
+        else:
+            tarinfo = member
+
+        #print('extract %s prefix=%s' % (tarinfo, prefix))
+
+        # Prepare the link target for makelink().
+        if tarinfo.islnk():
+            tarinfo._link_target = self._target_path(tarinfo.linkname, path, prefix)
+
+        try:
+            dst = self._target_path(tarinfo.name, path, prefix)
+            self._extract_member(tarinfo, dst,
+                                 set_attrs=set_attrs,
+                                 numeric_owner=numeric_owner)
+        except OSError as e:
+            if self.errorlevel > 0:
+                raise
+            else:
+                if e.filename is None:
+                    self._dbg(1, "tarfile: %s" % e.strerror)
+                else:
+                    self._dbg(1, "tarfile: %s %r" % (e.strerror, e.filename))
+        except tarfile.ExtractError as e:
+            if self.errorlevel > 1:
+                raise
+            else:
+                self._dbg(1, "tarfile: %s" % e)
+
+    def _write_member(self, tarinfo, dst, data, numeric_owner):
+        upperdirs = os.path.dirname(dst)
+        if upperdirs and not os.path.exists(upperdirs):
+            os.makedirs(upperdirs, exist_ok=True)
+        with open(dst, 'wb') as f:
+            f.write(data)
+        try:
+            self.chown(tarinfo, dst, numeric_owner=numeric_owner)
+            self.chmod(tarinfo, dst)
+            self.utime(tarinfo, dst)
+        except tarfile.ExtractError as e:
+            if self.errorlevel > 1:
+                raise
+            else:
+                self._dbg(1, "tarfile: %s" % e)
+        return len(data)
+
+    def extract_all_to(self, path=".", members=None, *, numeric_owner=False, prefix=None, workers=1):
+        """Extract all members from the archive to the current working
+           directory and set owner, modification time and permissions on
+           directories afterwards. `path' specifies a different directory
+           to extract to. `members' is optional and must be a subset of the
+           list returned by getmembers(). If `numeric_owner` is True, only
+           the numbers for user/group names are used and not the names.
+           With `workers' > 1 the archive is still read by the calling
+           thread, but the bodies of regular files are written by a thread
+           pool; links are only created once all pending files are written.
+           Returns the number of extracted files and bytes.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        directories = []
+        #print('extract_all_to prefix=%s' % prefix)
+
+        if members is None:
+            members = self
+
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        pending = collections.deque()
+        pending_bytes = 0
+        num_files = 0
+        num_bytes = 0
+
+        def _drain(max_bytes=0):
+            nonlocal pending_bytes, num_bytes
+            while pending and pending_bytes > max_bytes:
+                (size, future) = pending.popleft()
+                num_bytes += future.result()
+                pending_bytes -= size
+
+        try:
+            for tarinfo in members:
+                if prefix is not None:
+                    if not tarinfo.name.startswith(prefix):
+                        continue
+                num_files += 1
+                if tarinfo.isdir():
+                    # Extract directories with a safe mode.
+                    directories.append(tarinfo)
+                    tarinfo = copy.copy(tarinfo)
+                    tarinfo.mode = 0o700
+                elif executor is not None:
+                    if tarinfo.isreg() and tarinfo.sparse is None and tarinfo.size <= self.parallel_max_file_size:
+                        data = self.extractfile(tarinfo).read()
+                        dst = self._target_path(tarinfo.name, path, prefix)
+                        pending.append( (tarinfo.size, executor.submit(self._write_member, tarinfo, dst, data, numeric_owner)) )
+                        pending_bytes += tarinfo.size
+                        _drain(self.parallel_max_pending)
+                        continue
+                    elif not tarinfo.isreg():
+                        # link targets must be complete before the link is created
+                        _drain()
+                if tarinfo.isreg():
+                    num_bytes += tarinfo.size
+                # Do not set_attrs directories, as we will do that further down
+                self.extract(tarinfo, path, set_attrs=not tarinfo.isdir(),
+                             numeric_owner=numeric_owner, prefix=prefix)
+            _drain()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        # Reverse sort directories.
+        directories.sort(key=lambda a: a.name)
+        directories.reverse()
+
+        # Set correct owner, mtime and filemode on directories.
+        for tarinfo in directories:
+            dirpath = self._target_path(tarinfo.name, path, prefix)
+            try:
+                self.chown(tarinfo, dirpath, numeric_owner=numeric_owner)
+                self.utime(tarinfo, dirpath)
+                self.chmod(tarinfo, dirpath)
+            except tarfile.ExtractError as e:
+                if self.errorlevel > 1:
+                    raise
+                else:
+                    self._dbg(1, "tarfile: %s" % e)
+        return num_files, num_bytes
+
+# block-parallel decompressors by archive extension, in order of preference
+tar_decompressors = {
+    '.bz2': [ ['lbzip2', '-dc'], ['pbzip2', '-dc'] ],
+    '.gz': [ ['pigz', '-dc'] ],
+    '.xz': [ ['xz', '-T0', '-dc'], ['pixz', '-d'] ],
+    '.zst': [ ['zstd', '-T0', '-dcq'] ],
+}
+
+class tar_stream(object):
+    """Context manager which opens a compressed tar archive for sequential
+       reading. If a parallel decompressor for the archive is installed,
+       it runs as a child process and the archive is read from its output
+       as a stream, otherwise the stdlib codec is used. With `partial'
+       the caller may stop reading before the end of the archive and the
+       decompressor is terminated instead of waited for.
+    """
+    def __init__(self, archive, parallel=True, partial=False, verbose=False):
+        self._archive = archive
+        self._parallel = parallel
+        self._partial = partial
+        self._verbose = verbose
+        self._proc = None
+        self._tar = None
+
+    def _command(self):
+        if not self._parallel:
+            return None
+        _, ext = os.path.splitext(self._archive)
+        for c in tar_decompressors.get(ext, []):
+            if shutil.which(c[0]):
+                return c
+        return None
+
+    def __enter__(self):
+        import subprocess
+        cmd = self._command()
+        if cmd is None:
+            self._tar = MyTarFile.open(self._archive, 'r|*')
+            return self._tar
+        if self._verbose:
+            print('Decompress %s with %s' % (self._archive, cmd[0]))
+        with open(self._archive, 'rb') as f:
+            self._proc = subprocess.Popen(cmd, stdin=f, stdout=subprocess.PIPE, bufsize=1024*1024)
+        try:
+            self._tar = MyTarFile.open(fileobj=self._proc.stdout, mode='r|')
+        except:
+            self._proc.kill()
+            self._proc.wait()
+            raise
+        return self._tar
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._tar.close()
+        if self._proc is not None:
+            if exc_type is not None or self._partial:
+                self._proc.kill()
+            self._proc.stdout.close()
+            sts = self._proc.wait()
+            if exc_type is None and not self._partial and sts != 0:
+                raise tarfile.ReadError('%s failed with exit code %i' % (self._proc.args[0], sts))
+        return False
+
+# source directories of the CEF binary distribution for the paths
+# installed by the cmake install target (see debian/patches/do-cmake-install)
+install_source_dirs = [
+    ('usr/lib/cef.rel/icudtl.dat', 'Resources/icudtl.dat'),
+    ('usr/lib/cef.dbg/icudtl.dat', 'Resources/icudtl.dat'),
+    ('usr/include/', 'include/'),
+    ('usr/lib/cef.rel/', 'Release/'),
+    ('usr/lib/cef.dbg/', 'Debug/'),
+    ('usr/lib/libcef.so', 'Release/libcef.so'),
+    ('usr/lib/libcefd.so', 'Debug/libcef.so'),
+    ('usr/share/cef/Resources/', 'Resources/'),
+    ('usr/src/cef/CMakeLists.txt', 'CMakeLists.txt'),
+    ('usr/src/cef/cmake/', 'cmake/'),
+    ('usr/src/cef/libcef_dll/', 'libcef_dll/'),
+]
+
+# always needed to configure and build the package
+extract_build_globs = [ 'CMakeLists.txt', 'cmake/*', 'include/*', 'libcef_dll/*' ]
+
+# files the cmake install target (cef_install.cmake in
+# debian/patches/do-cmake-install) installs whatever binary packages are
+# built; its Debug/ rules only apply if Debug/ was extracted, which
+# depends on the install files of libcefd${cef:ABI}
+cmake_install_globs = [
+    'Release/libcef.so',
+    'Release/libEGL.so',
+    'Release/libGLESv2.so',
+    'Release/chrome-sandbox',
+    'Release/*.bin',
+    'Release/swiftshader/*',
+    'Resources/*',
+]
+
+def install_file_globs(install_files):
+    """Returns the archive paths (as globs relative to the top directory)
+       needed for the given debian/*.install files.
+    """
+    ret = list(extract_build_globs)
+    for filename in install_files:
+        try:
+            f = open(filename, 'r')
+            for line in f:
+                line = line.strip()
+                if not line or line[0] == '#':
+                    continue
+                src = line.split()[0].lstrip('/')
+                for (install_prefix, source_prefix) in install_source_dirs:
+                    if src.startswith(install_prefix):
+                        glob = source_prefix + src[len(install_prefix):]
+                        if glob not in ret:
+                            ret.append(glob)
+                        break
+            f.close()
+        except IOError as e:
+            print('Unable to open %s: %s' % (filename, e), file=sys.stderr)
+    return ret
+
+class member_filter(object):
+    """Selects the archive members below `prefix' which match one of the
+       given globs. The globs are compiled into a single expression and
+       the parent directories of all literal glob prefixes are indexed
+       once, so each member is checked with one match and one lookup.
+    """
+    def __init__(self, globs, prefix=None):
+        self._prefix = prefix
+        self._re = re.compile('|'.join([ fnmatch.translate(g) for g in globs ]))
+        self._parents = set()
+        for g in globs:
+            literal = re.split(r'[*?\[]', g, 1)[0]
+            parts = literal.split('/')[:-1]
+            for i in range(1, len(parts) + 1):
+                self._parents.add('/'.join(parts[:i]))
+
+    def __call__(self, tarinfo):
+        name = tarinfo.name
+        if self._prefix is not None:
+            if not name.startswith(self._prefix):
+                return False
+            name = name[len(self._prefix):]
+        name = name.strip('/')
+        if not name:
+            return True
+        if self._re.match(name):
+            return True
+        return tarinfo.isdir() and name in self._parents
+
+    def select(self, members):
+        """Yields the selected members. A hard link to a skipped file
+           cannot be created while the archive is streamed, so such links
+           are collected in `deferred_links' instead.
+        """
+        self.skipped = set()
+        self.deferred_links = []
+        for tarinfo in members:
+            if not self(tarinfo):
+                if tarinfo.isreg():
+                    self.skipped.add(tarinfo.name)
+                continue
+            if tarinfo.islnk() and tarinfo.linkname in self.skipped:
+                self.deferred_links.append(tarinfo)
+                continue
+            yield tarinfo
+
+def extract_deferred_links(archive, dest_dir, links, prefix=None, parallel=True, verbose=False):
+    """Create the hard links whose targets were not extracted, in a second
+       pass over the archive which extracts each target under the name of
+       its first link and links the others to it.
+    """
+    targets = collections.OrderedDict()
+    for tarinfo in links:
+        targets.setdefault(tarinfo.linkname, []).append(tarinfo)
+    if verbose:
+        print('Extract %i link targets from %s' % (len(targets), archive))
+    with tar_stream(archive, parallel=parallel, partial=True, verbose=verbose) as tar:
+        for member in tar:
+            wanted = targets.pop(member.name, None)
+            if wanted is None:
+                continue
+            first = copy.copy(member)
+            first.name = wanted[0].name
+            tar.extract(first, dest_dir, prefix=prefix)
+            first_path = tar._target_path(first.name, dest_dir, prefix)
+            for tarinfo in wanted[1:]:
+                link_path = tar._target_path(tarinfo.name, dest_dir, prefix)
+                if os.path.lexists(link_path):
+                    os.unlink(link_path)
+                os.link(first_path, link_path)
+            if not targets:
+                break
+    if targets:
+        raise tarfile.ReadError('link targets %s not found' % ', '.join(targets.keys()))
+
+def extract_archive(archive, dest_dir, prefix=None, parallel=True, workers=1, include=None, verbose=False):
+    from zipfile import ZipFile, BadZipFile
+    ret = False
+    b = os.path.basename(archive)
+    b, last_ext = os.path.splitext(b)
+    if last_ext == '.zip':
+        try:
+            with ZipFile(archive, 'r') as zipObj:
+                # Extract all the contents of zip file in different directory
+                zipObj.extractall(dest_dir)
+            ret = True
+        except BadZipFile as e:
+            print('ZIP file %s error: %s' % (archive, e), file=sys.stderr)
+    elif last_ext in tar_decompressors:
+        b, second_ext = os.path.splitext(b)
+        if second_ext == '.tar':
+            try:
+                start = time.monotonic()
+                selection = None
+                with tar_stream(archive, parallel=parallel, verbose=verbose) as tarObj:
+                    members = None
+                    if include is not None:
+                        selection = member_filter(include, prefix=prefix)
+                        members = selection.select(tarObj)
+                    # Extract all the contents of tar file in different directory
+                    num_files, num_bytes = tarObj.extract_all_to(dest_dir, members=members, prefix=prefix, workers=workers)
+                if selection is not None and selection.deferred_links:
+                    extract_deferred_links(archive, dest_dir, selection.deferred_links, prefix=prefix,
+                                           parallel=parallel, verbose=verbose)
+                    num_files += len(selection.deferred_links)
+                ret = True
+                trace.count('files', num_files)
+                trace.count('bytes', num_bytes)
+                if verbose:
+                    elapsed = max(time.monotonic() - start, 0.001)
+                    print('Extracted %i files, %i bytes from %s in %.1fs (%.2f MiB/s)' % (num_files, num_bytes, archive, elapsed, num_bytes / elapsed / (1024*1024)))
+            except (tarfile.TarError, OSError) as e:
+                print('Tar file %s error: %s' % (archive, e), file=sys.stderr)
+    return ret
+
+
+cef_version_h_member = 'include/cef_version.h'
+
+def probe_archive_cef_version(archive, parallel=True, verbose=False):
+    """Read the version fields of include/cef_version.h straight from
+       the binary distribution `archive' without extracting it. The tar
+       stream is only read up to that member. Returns a dict as
+       parse_cef_version_h() or None.
+    """
+    from zipfile import ZipFile, BadZipFile
+
+    def is_version_h(name):
+        name = name.lstrip('./')
+        return name == cef_version_h_member or \
+            (name.endswith('/' + cef_version_h_member) and name.count('/') == 2)
+
+    ret = None
+    try:
+        if archive.endswith('.zip'):
+            with ZipFile(archive, 'r') as zipObj:
+                for name in zipObj.namelist():
+                    if is_version_h(name):
+                        with zipObj.open(name) as f:
+                            ret = parse_cef_version_h(f.read(cef_version_h_max_size))
+                        break
+        else:
+            with tar_stream(archive, parallel=parallel, partial=True, verbose=verbose) as tarObj:
+                for tarinfo in tarObj:
+                    if tarinfo.isfile() and is_version_h(tarinfo.name):
+                        ret = parse_cef_version_h(tarObj.extractfile(tarinfo).read(cef_version_h_max_size))
+                        break
+    except (tarfile.TarError, BadZipFile, OSError) as e:
+        print('Unable to read %s: %s' % (archive, e), file=sys.stderr)
+        return None
+    if ret is None:
+        print('No %s in %s' % (cef_version_h_member, archive), file=sys.stderr)
+    return ret
+
+
+http_headers = {'User-Agent':'Mozilla/5.0', 'Accept': '*/*'}
+
+# options of the shared HTTP client, set from the command line
+http_client_options = {}
+
+def get_http_client():
+    """Returns the shared HTTP client; cef_fetch (and asyncio) are only
+       imported once something is fetched.
+    """
+    from cef_fetch import http_client
+    http_client.configure(**http_client_options)
+    return http_client
+
+re_content_range = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+re_content_range_size = re.compile(r'bytes\s+\*/(\d+)')
+
+class hashing_writer(object):
+    """File object wrapper which updates `hashers' with all written data."""
+    def __init__(self, fileobj, hashers):
+        self._fileobj = fileobj
+        self._hashers = hashers
+
+    def write(self, data):
+        for h in self._hashers:
+            h.update(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+def hash_file(filename, hashers, chunk_size=1024*1024):
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            for h in hashers:
+                h.update(chunk)
+
+def download_file(url, dest, chunk_size=1024*1024, verbose=False, hashers=[]):
+    """Download `url' to `dest' in chunks. The data is written to
+       `dest'.part first, which is renamed to `dest' once the download
+       is complete. If a partial file is left from an interrupted run,
+       the download is resumed with a HTTP Range request. The given
+       `hashers' are updated with the file content while it is streamed.
+    """
+    from cef_fetch import fetch_error
+    http_client = get_http_client()
+    part_file = dest + '.part'
+    offset = os.path.getsize(part_file) if os.path.isfile(part_file) else 0
+    hdr = dict(http_headers)
+    if offset:
+        hdr['Range'] = 'bytes=%i-' % offset
+    start = time.monotonic()
+    received = 0
+    try:
+        try:
+            response = http_client.open(url, headers=hdr)
+        except fetch_error as e:
+            if e.status != 416 or not offset:
+                raise
+            # the partial file already has the full size
+            m = re_content_range_size.search(e.headers.get('Content-Range', ''))
+            if m is None or int(m.group(1)) != offset:
+                raise
+            hash_file(part_file, hashers, chunk_size=chunk_size)
+            os.replace(part_file, dest)
+            return True
+        with response:
+            if response.status == 206:
+                m = re_content_range.search(response.headers.get('Content-Range', ''))
+                if m is None or int(m.group(1)) != offset:
+                    print('Invalid Content-Range for %s: %s' % (url, response.headers.get('Content-Range')), file=sys.stderr)
+                    return False
+                total = int(m.group(3)) if m.group(3) != '*' else None
+                mode = 'ab'
+                hash_file(part_file, hashers, chunk_size=chunk_size)
+                if verbose:
+                    print('Resume download of %s at %i bytes' % (url, offset))
+            else:
+                # server ignored the range, start from scratch
+                length = response.headers.get('Content-Length')
+                total = int(length) if length is not None else None
+                offset = 0
+                mode = 'wb'
+            with open(part_file, mode) as f:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    for h in hashers:
+                        h.update(chunk)
+                    received += len(chunk)
+    except fetch_error as e:
+        if e.status is not None:
+            print('Download of %s failed: %s' % (url, e), file=sys.stderr)
+        else:
+            print('Download of %s interrupted after %i bytes: %s' % (url, offset + received, e), file=sys.stderr)
+        return False
+    except OSError as e:
+        print('Download of %s interrupted after %i bytes: %s' % (url, offset + received, e), file=sys.stderr)
+        return False
+
+    size = offset + received
+    if total is not None and size != total:
+        print('Download of %s incomplete: %i of %i bytes' % (url, size, total), file=sys.stderr)
+        return False
+    os.replace(part_file, dest)
+    trace.count('bytes', received)
+    if verbose:
+        elapsed = max(time.monotonic() - start, 0.001)
+        print('Downloaded %s: %i bytes in %.1fs (%.2f MiB/s)' % (dest, received, elapsed, received / elapsed / (1024*1024)))
+    return True
+
+def _pwrite_all(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+
+def download_file_segmented(url, dest, segments=4, chunk_size=1024*1024, min_segment_size=8*1024*1024, verbose=False, hashers=[]):
+    """Download `url' to `dest' using up to `segments' concurrent HTTP
+       Range requests, each writing its part at the right offset into a
+       preallocated file. Falls back to download_file if the server does
+       not advertise `Accept-Ranges: bytes' or the file is too small.
+       The `hashers' are updated in file order while the segments arrive:
+       data at the hashed offset directly, data of later segments is read
+       back (from the page cache) once everything before it was received.
+       The segments share the connection limit per host of the HTTP client.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    http_client = get_http_client()
+    try:
+        with http_client.open(url, headers=http_headers, method='HEAD') as response:
+            accept_ranges = response.headers.get('Accept-Ranges', '')
+            length = response.headers.get('Content-Length')
+    except OSError:
+        accept_ranges = ''
+        length = None
+    if 'bytes' not in accept_ranges.lower() or length is None:
+        if verbose:
+            print('No range support for %s, use single stream' % url)
+        return download_file(url, dest, chunk_size=chunk_size, verbose=verbose, hashers=hashers)
+    total = int(length)
+    segments = min(segments, total // min_segment_size)
+    if segments < 2:
+        return download_file(url, dest, chunk_size=chunk_size, verbose=verbose, hashers=hashers)
+
+    segment_size = (total + segments - 1) // segments
+    ranges = [ (start, min(start + segment_size, total) - 1) for start in range(0, total, segment_size) ]
+
+    seg_file = dest + '.seg'
+    start_time = time.monotonic()
+    fd = os.open(seg_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    # end of the data received for each segment and offset up to which the
+    # hashers are updated
+    progress = [ start for (start, end) in ranges ]
+    hashed = [0]
+    hash_lock = threading.Lock()
+
+    def _hash(index, chunk, pos):
+        with hash_lock:
+            progress[index] = pos + len(chunk)
+            if pos == hashed[0]:
+                for h in hashers:
+                    h.update(chunk)
+                hashed[0] += len(chunk)
+            while hashed[0] < total:
+                available = progress[hashed[0] // segment_size]
+                if available <= hashed[0]:
+                    break
+                data = os.pread(fd, min(chunk_size, available - hashed[0]), hashed[0])
+                if not data:
+                    raise IOError('unable to read back %s at %i' % (seg_file, hashed[0]))
+                for h in hashers:
+                    h.update(data)
+                hashed[0] += len(data)
+
+    def _fetch(index):
+        start, end = ranges[index]
+        hdr = dict(http_headers)
+        hdr['Range'] = 'bytes=%i-%i' % (start, end)
+        pos = start
+        with http_client.open(url, headers=hdr) as response:
+            if response.status != 206:
+                raise IOError('server ignored range request %s' % hdr['Range'])
+            while pos <= end:
+                chunk = response.read(min(chunk_size, end + 1 - pos))
+                if not chunk:
+                    break
+                _pwrite_all(fd, chunk, pos)
+                if hashers:
+                    _hash(index, chunk, pos)
+                pos += len(chunk)
+        if pos != end + 1:
+            raise IOError('segment %i-%i incomplete at %i' % (start, end, pos))
+        return end + 1 - start
+
+    ret = False
+    try:
+        try:
+            os.posix_fallocate(fd, 0, total)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, total)
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            received = sum(executor.map(_fetch, range(len(ranges))))
+        if hashers and hashed[0] != total:
+            raise IOError('hashed %i of %i bytes of %s' % (hashed[0], total, seg_file))
+        ret = True
+    except OSError as e:
+        print('Segmented download of %s failed: %s' % (url, e), file=sys.stderr)
+    finally:
+        os.close(fd)
+
+    if not ret:
+        os.unlink(seg_file)
+        return False
+    os.replace(seg_file, dest)
+    trace.count('bytes', received)
+    if verbose:
+        elapsed = max(time.monotonic() - start_time, 0.001)
+        print('Downloaded %s: %i bytes in %i segments, %.1fs (%.2f MiB/s)' % (dest, received, len(ranges), elapsed, received / elapsed / (1024*1024)))
+    return True
+
+def request_sha1(url):
+    """Start fetching the `.sha1' sidecar of `url' in the background;
+       pass the result to download_sha1().
+    """
+    return get_http_client().submit(url + '.sha1', headers=http_headers, max_size=1024)
+
+def download_sha1(url, request=None):
+    """Returns the SHA-1 published in the `.sha1' sidecar of `url' or
+       None if the site does not provide one (404). Other errors, like
+       timeouts or 5xx responses, are raised as IOError, so a transient
+       failure does not skip the verification. `request' is the result of
+       an earlier request_sha1() call.
+    """
+    if request is None:
+        request = request_sha1(url)
+    try:
+        status, headers, body = request.result()
+    except OSError as e:
+        if getattr(e, 'status', None) == 404:
+            return None
+        raise IOError('unable to fetch the SHA-1 of %s: %s' % (url, e))
+    data = body.decode('utf-8', 'replace').split()
+    if data and re.match(r'^[0-9a-fA-F]{40}$', data[0]):
+        return data[0].lower()
+    return None
+
+def archive_extension(filename):
+    """Returns the archive extension of `filename', e.g. `.tar.bz2'."""
+    b, ext = os.path.splitext(filename)
+    if ext in ['.gz', '.bz2', '.xz', '.zst']:
+        b, second_ext = os.path.splitext(b)
+        if second_ext == '.tar':
+            ext = second_ext + ext
+    return ext
+
+def parse_size(value):
+    units = { 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4 }
+    value = value.strip().upper()
+    if value.endswith('B'):
+        value = value[:-1]
+    factor = 1
+    if value and value[-1] in units:
+        factor = units[value[-1]]
+        value = value[:-1]
+    return int(float(value) * factor)
+
+class download_cache(object):
+    """Content-addressed store for the downloaded archives.
+
+       The archives are kept as objects/<sha256><ext> below `cache_dir' and
+       index.json maps the archive file name to the object together with
+       its SHA-1, size, source URL and last use. Entries which have not
+       been used for `max_age' seconds, or the least recently used ones
+       beyond `max_size' bytes, are removed by evict(), together with
+       objects no entry refers to anymore. The last use recorded by
+       lookup() is only written with the next change of the index or by
+       evict(), so read-only runs leave index.json alone.
+    """
+    def __init__(self, cache_dir, max_size=None, max_age=None, verbose=False):
+        self._dir = cache_dir
+        self._objects_dir = os.path.join(cache_dir, 'objects')
+        self._index_file = os.path.join(cache_dir, 'index.json')
+        self._max_size = max_size
+        self._max_age = max_age
+        self._verbose = verbose
+        self._lock = threading.Lock()
+        self._index = {}
+        self._pinned = set()
+        self._dirty = False
+        try:
+            with open(self._index_file, 'r') as f:
+                self._index = json.load(f)
+        except (IOError, ValueError) as e:
+            if os.path.isfile(self._index_file):
+                print('Unable to read cache index %s: %s' % (self._index_file, e), file=sys.stderr)
+
+    def _object_path(self, entry):
+        return os.path.join(self._objects_dir, entry['object'])
+
+    def _save(self):
+        mkdir_p(self._dir)
+        tmp = self._index_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._index_file)
+        self._dirty = False
+
+    def _drop_object(self, entry):
+        """Delete the object of `entry' unless another name still uses it."""
+        if any([ o['object'] == entry['object'] for o in self._index.values() ]):
+            return 0
+        try:
+            os.unlink(self._object_path(entry))
+        except FileNotFoundError:
+            return 0
+        except OSError as ex:
+            print('Unable to delete %s: %s' % (self._object_path(entry), ex), file=sys.stderr)
+            return 0
+        return entry.get('size', 0)
+
+    def lookup(self, name):
+        """Returns the object file for the archive `name' or None."""
+        with self._lock:
+            entry = self._index.get(name, None)
+            if entry is None or 'object' not in entry:
+                return None
+            path = self._object_path(entry)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            if size != entry.get('size', None):
+                print('Cached archive %s is damaged, discard it' % name, file=sys.stderr)
+                del self._index[name]
+                self._pinned.discard(entry['object'])
+                self._drop_object(entry)
+                self._save()
+                return None
+            entry['last_used'] = time.time()
+            self._pinned.add(entry['object'])
+            self._dirty = True
+            return path
+
+    def add(self, name, filename, sha256, sha1=None, url=None, extension=None):
+        """Moves `filename' into the store as archive `name' and returns
+           the object file. The object keeps the archive extension of
+           `name' (or the given `extension'), since extract_archive selects
+           the format by it.
+        """
+        if extension is None:
+            extension = archive_extension(name)
+        entry = {
+            'object': sha256 + extension,
+            'sha256': sha256,
+            'sha1': sha1,
+            'url': url,
+        }
+        mkdir_p(self._objects_dir)
+        path = self._object_path(entry)
+        with self._lock:
+            if os.path.isfile(path):
+                os.unlink(filename)
+            else:
+                os.replace(filename, path)
+            old = self._index.pop(name, None)
+            if old is not None and old.get('object') != entry['object']:
+                self._pinned.discard(old.get('object'))
+                if 'object' in old:
+                    self._drop_object(old)
+            now = time.time()
+            entry['size'] = os.path.getsize(path)
+            entry['added'] = now
+            entry['last_used'] = now
+            self._index[name] = entry
+            self._pinned.add(entry['object'])
+            self._save()
+        return path
+
+    def get_info(self, name, key):
+        """Returns metadata `key' stored with the archive `name' or None."""
+        with self._lock:
+            entry = self._index.get(name, None)
+            return entry.get(key, None) if entry is not None else None
+
+    def set_info(self, name, key, value):
+        """Store metadata about the archive `name', e.g. the result of a
+           probe, so it doesn't have to be read again.
+        """
+        with self._lock:
+            entry = self._index.get(name, None)
+            if entry is not None:
+                entry[key] = value
+                self._save()
+
+    def remove(self, name):
+        with self._lock:
+            entry = self._index.pop(name, None)
+            if entry is not None:
+                self._pinned.discard(entry.get('object'))
+                if 'object' in entry:
+                    self._drop_object(entry)
+                self._save()
+
+    def evict(self):
+        """Remove expired and least recently used archives; archives used
+           by the current run are kept. Returns the number of bytes freed.
+        """
+        freed = 0
+        with self._lock:
+            now = time.time()
+            entries = sorted(self._index.items(), key=lambda e: e[1].get('last_used', 0))
+            total = sum([ e.get('size', 0) for (name, e) in entries ])
+            evicted = []
+            for (name, e) in entries:
+                if e.get('object') in self._pinned:
+                    continue
+                expired = self._max_age is not None and now - e.get('last_used', 0) > self._max_age
+                too_big = self._max_size is not None and total > self._max_size
+                if not expired and not too_big:
+                    continue
+                evicted.append(name)
+                total -= e.get('size', 0)
+            for name in evicted:
+                e = self._index.pop(name)
+                if self._verbose:
+                    print('Evict %s from download cache' % name)
+                if 'object' in e:
+                    freed += self._drop_object(e)
+            if evicted or self._dirty:
+                self._save()
+            freed += self._sweep()
+        return freed
+
+    def _sweep(self):
+        """Delete objects which are not referenced by any entry, e.g. left
+           by an interrupted run. Returns the number of bytes freed.
+        """
+        freed = 0
+        referenced = set([ e.get('object') for e in self._index.values() ])
+        try:
+            names = os.listdir(self._objects_dir)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if name in referenced:
+                continue
+            path = os.path.join(self._objects_dir, name)
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+            except OSError as ex:
+                print('Unable to delete %s: %s' % (path, ex), file=sys.stderr)
+                continue
+            if self._verbose:
+                print('Remove unreferenced %s from download cache' % name)
+            freed += size
+        return freed
+
+re_index_tag = re.compile(r'<(/?)(table|tr)\b([^>]*)>', re.IGNORECASE)
+re_index_attr = re.compile(r'([a-zA-Z_:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+class spotify_index_parser(object):
+    """Incremental tokenizer for the cefbuilds index page which only looks
+       at <table> and <tr> tags and collects the data-version of the
+       `toprow' rows in the table of the given platform. Once that table
+       has been passed, or all requested `majors' have been seen and an
+       older major follows, `done' is set and the rest of the page can be
+       skipped.
+    """
+    def __init__(self, platform, majors=None):
+        self.platform = platform
+        self.majors = set(majors) if majors else None
+        self.builds = []
+        self.done = False
+        self._seen_majors = set()
+        self._in_table = False
+        self._table_depth = 0
+        self._pending = ''
+
+    def feed(self, text):
+        if self.done:
+            return
+        text = self._pending + text
+        pos = 0
+        for m in re_index_tag.finditer(text):
+            pos = m.end()
+            closing, tag, attrs = m.group(1), m.group(2).lower(), m.group(3)
+            if tag == 'table':
+                if closing:
+                    if self._in_table:
+                        if self._table_depth:
+                            self._table_depth -= 1
+                        else:
+                            self._in_table = False
+                            self.done = True
+                elif self._in_table:
+                    self._table_depth += 1
+                elif self._attrs(attrs).get('id', None) == self.platform:
+                    self._in_table = True
+            elif not closing and self._in_table and self._table_depth == 0:
+                a = self._attrs(attrs)
+                version = a.get('data-version', None)
+                if a.get('class', None) == 'toprow' and version:
+                    self._add_build(version)
+            if self.done:
+                self._pending = ''
+                return
+        # keep an incomplete tag at the end for the next chunk
+        rest = text[pos:]
+        i = rest.rfind('<')
+        self._pending = rest[i:] if i >= 0 and '>' not in rest[i:] else ''
+
+    @staticmethod
+    def _attrs(attrs):
+        import html
+        ret = {}
+        for m in re_index_attr.finditer(attrs):
+            value = m.group(2) if m.group(2) is not None else m.group(3)
+            ret[m.group(1).lower()] = html.unescape(value)
+        return ret
+
+    def _add_build(self, version):
+        major, _ = version.split('.', 1)
+        try:
+            major = int(major)
+        except ValueError:
+            major = 0
+        if major <= 3:
+            return
+        if self.majors is not None:
+            # builds are listed newest first
+            if major not in self.majors and self._seen_majors == self.majors and major < min(self.majors):
+                self.done = True
+                return
+            if major in self.majors:
+                self._seen_majors.add(major)
+        self.builds.append( (major, version) )
+
+def extract_builds(data, platform='linux64', majors=None, chunk_size=64*1024):
+    """Returns the (major, version) builds of `platform' from the index
+       page given as str, bytes or iterable of bytes chunks.
+    """
+    return extract_platform_builds(data, [platform], majors=majors, chunk_size=chunk_size)[platform]
+
+def extract_platform_builds(data, platforms, majors=None, chunk_size=64*1024):
+    """Returns a dict which maps each of the given platforms to its
+       (major, version) builds. The page is read only once and only until
+       the tables of all platforms have been parsed.
+    """
+    parsers = [ spotify_index_parser(platform, majors=majors) for platform in platforms ]
+    if isinstance(data, (str, bytes)):
+        data = [ data[i:i + chunk_size] for i in range(0, len(data), chunk_size) ]
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    for chunk in data:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        for parser in parsers:
+            parser.feed(chunk)
+        if all([ parser.done for parser in parsers ]):
+            break
+    else:
+        text = decoder.decode(b'', final=True)
+        for parser in parsers:
+            parser.feed(text)
+    return dict([ (parser.platform, parser.builds) for parser in parsers ])
+
+def _read_chunks(response, chunk_size=64*1024):
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        trace.count('bytes', len(chunk))
+        yield chunk
+# compressors for re-packed archives: archive extension, external commands
+# in order of preference and the tarfile stream mode used as fallback
+tar_compressors = {
+    'bz2': ('tar.bz2', [ ['lbzip2', '-c'], ['pbzip2', '-c'] ], 'w|bz2'),
+    'gz': ('tar.gz', [ ['pigz', '-c'] ], 'w|gz'),
+    'xz': ('tar.xz', [ ['xz', '-T0', '-c'] ], 'w|xz'),
+    'zstd': ('tar.zst', [ ['zstd', '-T0', '-qc'] ], None),
+}
+
+def _tar_member_name(name):
+    """Normalize the tar member `name' for matching."""
+    while name.startswith('./'):
+        name = name[2:]
+    return name.rstrip('/')
+
+def filter_tarfile(src, dest, delete_files=[], prefix=None, codec='bz2', hashers=[], verbose=False):
+    """Copy all members of the tar archive `src' to `dest' in a single
+       streaming pass, skipping the `delete_files' (given relative to
+       the top directory `prefix'). The output is compressed with `codec'
+       using a multi-threaded external compressor when one is installed.
+       The `hashers' are updated with the written archive data. Member
+       names are matched without a leading './'. A hard link to a removed
+       file is turned into a regular file with the removed content, and
+       further links to it point to that file instead.
+    """
+    import subprocess
+    import tempfile
+    if codec not in tar_compressors:
+        print('Unsupported archive codec %s' % codec, file=sys.stderr)
+        return False
+    _, commands, stdlib_mode = tar_compressors[codec]
+    cmd = None
+    for c in commands:
+        if shutil.which(c[0]):
+            cmd = c
+            break
+    if cmd is None and stdlib_mode is None:
+        print('No compressor for %s installed' % codec, file=sys.stderr)
+        return False
+
+    if prefix is not None:
+        skip = set([ _tar_member_name(prefix + '/' + f.lstrip('/')) for f in delete_files ])
+    else:
+        skip = set([ _tar_member_name(f) for f in delete_files ])
+    # content of the removed regular files, for hard links to them
+    removed = {}
+    # removed hard link targets -> name of the member which now holds the content
+    promoted = {}
+
+    tmp = dest + '.tmp'
+    ret = False
+    proc = None
+    copied = 0
+    skipped = 0
+    start = time.monotonic()
+    try:
+        with open(tmp, 'wb') as fout:
+            if cmd is not None:
+                if verbose:
+                    print('Compress %s with %s' % (dest, cmd[0]))
+                proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+                def _write_output():
+                    try:
+                        while True:
+                            chunk = proc.stdout.read(1024*1024)
+                            if not chunk:
+                                break
+                            fout.write(chunk)
+                            for h in hashers:
+                                h.update(chunk)
+                    except BaseException as e:
+                        writer_error.append(e)
+                        # nobody reads the compressor output anymore, so
+                        # stop it before writing its input blocks forever
+                        proc.kill()
+                writer_error = []
+                writer = threading.Thread(target=_write_output)
+                writer.start()
+                tout = tarfile.open(fileobj=proc.stdin, mode='w|')
+            else:
+                tout = tarfile.open(fileobj=hashing_writer(fout, hashers), mode=stdlib_mode)
+            try:
+                with tar_stream(src, verbose=verbose) as tin:
+                    for member in tin:
+                        name = _tar_member_name(member.name)
+                        if name in skip:
+                            skipped += 1
+                            if verbose:
+                                print('Remove %s' % member.name)
+                            if member.isreg():
+                                data = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(dest)))
+                                shutil.copyfileobj(tin.extractfile(member), data, 1024*1024)
+                                removed[name] = (member, data)
+                            continue
+                        target = _tar_member_name(member.linkname) if member.islnk() else None
+                        if target in promoted:
+                            member = copy.copy(member)
+                            member.linkname = promoted[target]
+                            tout.addfile(member)
+                        elif target in removed:
+                            target_member, data = removed.pop(target)
+                            promoted[target] = member.name
+                            member = copy.copy(member)
+                            member.type = tarfile.REGTYPE
+                            member.linkname = ''
+                            member.size = target_member.size
+                            data.seek(0)
+                            tout.addfile(member, data)
+                            data.close()
+                            if verbose:
+                                print('Replace link %s by removed %s' % (member.name, target_member.name))
+                        elif member.isreg():
+                            tout.addfile(member, tin.extractfile(member))
+                        else:
+                            tout.addfile(member)
+                        copied += 1
+            finally:
+                for (target_member, data) in removed.values():
+                    data.close()
+                try:
+                    tout.close()
+                finally:
+                    if proc is not None:
+                        try:
+                            proc.stdin.close()
+                        except OSError:
+                            # the compressor is gone, see its exit code
+                            pass
+                        writer.join()
+                        if writer_error:
+                            raise IOError('writing %s failed: %s' % (tmp, writer_error[0]))
+                        if proc.wait() != 0:
+                            raise IOError('%s failed with exit code %i' % (cmd[0], proc.returncode))
+        os.replace(tmp, dest)
+        ret = True
+    except (tarfile.TarError, OSError) as e:
+        print('Failed to filter %s to %s: %s' % (src, dest, e), file=sys.stderr)
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        if os.path.isfile(tmp):
+            os.unlink(tmp)
+    if ret and verbose:
+        print('Re-packed %s: %i members copied, %i removed in %.1fs' % (dest, copied, skipped, time.monotonic() - start))
+    return ret
+
+def get_spotify_builds(url, platforms=['linux64'], cache_file=None, ttl=3600, verbose=False, majors=None):
+    """Returns a dict which maps each of the given platforms to the list
+       of (major, version) builds in the cefbuilds index at `url'. If
+       `cache_file' is given, the
+       parsed builds are stored there and reused for `ttl' seconds; after
+       that the index is revalidated with ETag/If-Modified-Since and only
+       downloaded and parsed again if it has changed. If `majors' is given,
+       reading the page stops once the builds of these majors are found;
+       the cache records the scanned majors and is used for every request
+       of a subset of them.
+    """
+    scan_majors = sorted(majors) if majors else None
+    cache = None
+    if cache_file is not None:
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+            if cache.get('url') != url or cache.get('platforms') != sorted(platforms):
+                cache = None
+        except (IOError, ValueError):
+            cache = None
+    if cache is not None and cache.get('majors', None) is not None:
+        cached_majors = set(cache['majors'])
+        if scan_majors is None or not cached_majors.issuperset(scan_majors):
+            # scan for the cached majors as well, so the cache keeps
+            # covering them
+            if scan_majors is not None:
+                scan_majors = sorted(cached_majors.union(scan_majors))
+            cache = None
+    if cache is not None:
+        cached_builds = dict([ (platform, [ tuple(b) for b in builds ]) for (platform, builds) in cache.get('builds', {}).items() ])
+        if time.time() - cache.get('fetched', 0) < ttl:
+            if verbose:
+                print('Use cached index %s' % url)
+            return cached_builds
+
+    http_client = get_http_client()
+    #print(url)
+    hdr = dict(http_headers)
+    if cache is not None:
+        if cache.get('etag'):
+            hdr['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            hdr['If-Modified-Since'] = cache['last_modified']
+    ret = None
+    try:
+        response = http_client.open(url, headers=hdr)
+        if response.status == 304 and cache is not None:
+            if verbose:
+                print('Index %s not modified' % url)
+            ret = cached_builds
+        elif response.status == 200:
+            with response:
+                ret = extract_platform_builds(_read_chunks(response), platforms, majors=scan_majors)
+            cache = {
+                'url': url,
+                'platforms': sorted(platforms),
+                'majors': scan_majors,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'builds': ret,
+            }
+        else:
+            response.close()
+    except OSError as e:
+        print('Unable to fetch %s: %s' % (url, e), file=sys.stderr)
+        return None
+
+    if ret is not None and cache_file is not None:
+        cache['fetched'] = time.time()
+        try:
+            tmp = cache_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp, cache_file)
+        except IOError as e:
+            print('Unable to write %s: %s' % (cache_file, e), file=sys.stderr)
+    return ret
+
+re_mirror_archive = re.compile(r'^cef_binary_(.+?)_([a-z0-9]+)(_minimal|_client)?\.(tar\.[a-z0-9]+|zip)$')
+
+def build_version_key(version):
+    """Sort key of a build version like 78.3.9+gabcdef+chromium-78.0.3904.108"""
+    ret = []
+    for v in version.split('+', 1)[0].split('.'):
+        try:
+            ret.append(int(v))
+        except ValueError:
+            ret.append(0)
+    return ret
+
+def mirror_base_url(mirror):
+    """Returns the base URL of a mirror given as URL or local directory"""
+    if '://' not in mirror and not mirror.startswith('file:'):
+        import pathlib
+        mirror = pathlib.Path(os.path.abspath(mirror)).as_uri()
+    if not mirror.endswith('/'):
+        mirror += '/'
+    return mirror
+
+def write_mirror_index(site_dir, verbose=False):
+    """Generate index.html in `site_dir' listing all mirrored archives in
+       the layout of the cefbuilds index: one table per platform with a
+       `toprow' row per build, newest first.
+    """
+    import html
+    platforms = {}
+    for basename in os.listdir(site_dir):
+        m = re_mirror_archive.match(basename)
+        if m is None:
+            continue
+        version, platform = m.group(1), m.group(2)
+        platforms.setdefault(platform, {}).setdefault(version, []).append(basename)
+    lines = [ '<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>CEF builds mirror</title></head><body>' ]
+    for platform in sorted(platforms.keys()):
+        lines.append('<h3>%s</h3>' % html.escape(platform))
+        lines.append('<table id="%s" class="builds">' % html.escape(platform))
+        for version in sorted(platforms[platform].keys(), key=build_version_key, reverse=True):
+            lines.append('<tr class="toprow" data-version="%s"><td>%s</td></tr>' % (html.escape(version), html.escape(version)))
+            for basename in sorted(platforms[platform][version]):
+                href = urllib.parse.quote(basename)
+                lines.append('<tr class="filerow"><td><a href="%s">%s</a> (<a href="%s.sha1">sha1</a>)</td></tr>' % (href, html.escape(basename), href))
+        lines.append('</table>')
+    lines.append('</body></html>')
+    index = os.path.join(site_dir, 'index.html')
+    if write_if_changed(index, ('\n'.join(lines) + '\n').encode('utf-8')) and verbose:
+        print('Updated mirror index %s' % index)
+    return index
+
+re_cef_version_define = re.compile(r'^#define[ \t]+(CEF_[A-Z_]+|CHROME_VERSION_[A-Z]+)[ \t]+(\S+)', re.M)
+re_source_format = re.compile(r'([0-9]+.[0-9]+)\s*\((a-zA-Z)\)')
+re_changelog_head = re.compile(r'^(\S+)\s+\(([^()\s]+)\)')
+
+# cef_version.h is a few KiB; never read more than this from it
+cef_version_h_max_size = 64 * 1024
+
+cef_version_fields = {
+    'CEF_VERSION': 'version',
+    'CEF_VERSION_MAJOR': 'major',
+    'CEF_VERSION_MINOR': 'minor',
+    'CEF_VERSION_PATCH': 'patch',
+    'CEF_COMMIT_NUMBER': 'commit_number',
+    'CEF_COMMIT_HASH': 'commit_hash',
+    'CHROME_VERSION_MAJOR': 'chrome_major',
+    'CHROME_VERSION_MINOR': 'chrome_minor',
+    'CHROME_VERSION_BUILD': 'chrome_build',
+    'CHROME_VERSION_PATCH': 'chrome_patch',
+    }
+
+
+def parse_cef_version_h(data):
+    """Extract the version fields from the content of cef_version.h.
+       Returns a dict or None if CEF_VERSION is missing.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    ret = {}
+    for m in re_cef_version_define.finditer(data):
+        key = cef_version_fields.get(m.group(1))
+        if key is None or key in ret:
+            continue
+        value = m.group(2).strip('\'"')
+        ret[key] = int(value) if value.isdigit() and key != 'commit_hash' else value
+    if 'version' not in ret:
+        return None
+    if all(k in ret for k in ['chrome_major', 'chrome_minor', 'chrome_build', 'chrome_patch']):
+        ret['chromium_version'] = '%s.%s.%s.%s' % (ret['chrome_major'], ret['chrome_minor'], ret['chrome_build'], ret['chrome_patch'])
+    return ret
+
+
+def probe_cef_version(repo_dir, verbose=False):
+    """Return the version fields of include/cef_version.h in `repo_dir'.
+       The result is also written to debian/cef_version.json, which is
+       read by debian/rules and thus part of the source package. It only
+       holds the version fields, so it is rewritten when the header
+       changes the version and left alone otherwise.
+    """
+    header = os.path.join(repo_dir, 'include', 'cef_version.h')
+    sidecar = os.path.join(repo_dir, 'debian', 'cef_version.json')
+    try:
+        with open(header, 'rb') as f:
+            info = parse_cef_version_h(f.read(cef_version_h_max_size))
+    except IOError as e:
+        print('Unable to open %s: %s' % (header, e), file=sys.stderr)
+        return None
+    if info is None:
+        print('Failed to get version from %s.' % header, file=sys.stderr)
+        return None
+    if os.path.isdir(os.path.dirname(sidecar)):
+        # one key per line, so debian/rules can pick values with sed
+        if write_if_changed(sidecar, (json.dumps(info, indent=1, sort_keys=True) + '\n').encode('utf-8')) and verbose:
+            print('Wrote %s' % sidecar)
+    return info
+
+
+def increment_debian_revision(rev, strategy):
+    e = rev.split('.')
+    if strategy == 'minor':
+        if len(e) < 2:
+            e.append('0')
+    try:
+        num = int(e[-1]) + 1
+    except ValueError:
+        num = 0 if strategy != 'minor' else 1
+    e[-1] = str(num)
+    return '.'.join(e)
+
+def changelog_version(filename):
+    """Returns the version of the topmost entry of a debian/changelog by
+       reading only its first line, or None.
+    """
+    try:
+        with open(filename, 'r') as f:
+            m = re_changelog_head.match(f.readline())
+    except IOError:
+        return None
+    return m.group(2) if m else None
+
+def tree_digest(root, ignore=None):
+    """Returns a digest over the names, sizes and mtimes below `root'."""
+    entries = sorted(scan_tree(root, ignore=ignore).items())
+    return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
+
+def files_digest(root, names):
+    """Returns a digest over the content of the given files below `root'."""
+    h = hashlib.sha256()
+    for name in sorted(names):
+        h.update(name.encode('utf-8') + b'\0')
+        try:
+            hash_file(os.path.join(root, name), [h])
+        except IOError:
+            h.update(b'\0missing')
+    return h.hexdigest()
+
+class package_state(object):
+    """Persistent state of a package repository, stored as JSON in
+       `filename'. For every stage it records the inputs the stage last
+       completed with, next to values like the last build, the archive
+       hash, the rendered debian/ hash and the published version. A stage
+       whose inputs equal the recorded ones can be skipped.
+    """
+    def __init__(self, filename):
+        self._filename = filename
+        self._data = {}
+        try:
+            with open(filename, 'r') as f:
+                self._data = json.load(f)
+        except (IOError, ValueError) as e:
+            if os.path.isfile(filename):
+                print('Unable to read package state %s: %s' % (filename, e), file=sys.stderr)
+        self._data.setdefault('stages', {})
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def unchanged(self, stage, inputs):
+        return self._data['stages'].get(stage, None) == inputs
+
+    def done(self, stage, inputs, **values):
+        """Record that `stage' completed with `inputs' and save the state."""
+        self._data['stages'][stage] = inputs
+        self._data.update(values)
+        tmp = self._filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._filename)
+
+# exit code of main when a package fails in the given stage; the
+# --force-extract extraction counts as part of the download
+pipeline_stage_exit_code = {
+    'download': 3,
+    'force-extract': 3,
+    'extract': 4,
+    'configure': 4,
+    'changelog': 4,
+    'publish': 5,
+}
+
+# default number of packages which may run in the same stage at once;
+# ppa_publish is interactive (signing), so only one package at a time.
+pipeline_stage_limits = {
+    'download': 2,
+    'force-extract': 2,
+    'extract': 2,
+    'configure': 4,
+    'changelog': 4,
+    'publish': 1,
+}
+
+class package_pipeline(object):
+    """Run a list of (stage, func) pairs for each package on a bounded
+       thread pool. Every package passes the stages in order and stops at
+       the first stage which fails, while the other packages continue.
+       The number of packages inside a stage at the same time is limited
+       by `stage_limits', so downloads, extraction and publishing do not
+       starve each other.
+    """
+    def __init__(self, stages, jobs=1, stage_limits=None):
+        self._stages = stages
+        self._jobs = max(1, jobs)
+        limits = dict(pipeline_stage_limits)
+        if stage_limits:
+            limits.update(stage_limits)
+        self._semaphores = {}
+        for (stage, func) in stages:
+            limit = max(1, limits.get(stage, self._jobs))
+            self._semaphores[stage] = threading.BoundedSemaphore(limit)
+
+    def _run_package(self, name, details):
+        for (stage, func) in self._stages:
+            with self._semaphores[stage], trace.span(stage, package=name) as span:
+                try:
+                    ok = func(name, details)
+                except Exception as e:
+                    print('%s: %s failed: %s' % (name, stage, e), file=sys.stderr)
+                    ok = False
+                span.args['ok'] = ok
+            if not ok:
+                return stage
+        return None
+
+    def run(self, packages):
+        """Process all given (name, details) pairs and return a dict
+           which maps each package name to the stage it failed in, or
+           None if all stages succeeded.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        ret = {}
+        if self._jobs == 1:
+            for (name, details) in packages:
+                ret[name] = self._run_package(name, details)
+        else:
+            with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+                futures = []
+                for (name, details) in packages:
+                    futures.append( (name, executor.submit(self._run_package, name, details)) )
+                for (name, future) in futures:
+                    ret[name] = future.result()
+        return ret
+
+class cef_package_update_app(object):
+    def __init__(self):
+        self._verbose = False
+        self._packages = []
+        self._jobs = 1
+        self._stage_limits = {}
+        self._segments = 1
+        self._index_ttl = 3600
+        self._repack_codec = None
+        self._extract_workers = 1
+        self._force = False
+        self._force_extract = False
+        self._states = {}
+        self._skipped = {}
+        self._mirrors = {}
+        self._mirror_dir = None
+        self._platforms = None
+        self._build_jobs = {}
+        self._templates_digest = None
+        self._changelog_versions = {}
+        self._changelog_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def _site_platform(self, details):
+        site = site_list.get(details.get('site', None), None)
+        return site.get('platform', 'linux64') if site else 'linux64'
+
+    def _package_platforms(self, details):
+        """Returns the CEF platforms to build for the given package."""
+        platforms = details.get('platforms', [self._site_platform(details)])
+        if self._platforms is not None:
+            platforms = [ p for p in platforms if p in self._platforms ]
+        return platforms
+
+    def _get_site_builds(self, name, details):
+        index = details.get('index', None)
+        cache_file = os.path.join(self._download_dir, 'index-%s.json' % name)
+        majors = set()
+        platforms = set()
+        for pkg_name, pkg_details in package_list.items():
+            if pkg_name not in self._packages or pkg_details.get('disable', False):
+                continue
+            if pkg_details.get('site', None) == name:
+                if pkg_details.get('version', None) is not None:
+                    majors.add(pkg_details['version'])
+                platforms.update(self._package_platforms(pkg_details))
+        if not platforms:
+            return
+        with trace.span('index', site=name):
+            builds = get_spotify_builds(index, platforms=sorted(platforms),
+                                        cache_file=cache_file, ttl=self._index_ttl, verbose=self._verbose,
+                                        majors=majors or None)
+        #print(builds)
+        if builds:
+            site_list[name]['builds'] = builds
+
+    def _get_latest_revisions(self):
+        mkdir_p(self._download_dir)
+        sites = [ (name, details) for (name, details) in site_list.items() if details.get('index', None) is not None ]
+        if len(sites) > 1:
+            # the index pages of all sites are fetched at the same time
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+                for f in [ executor.submit(self._get_site_builds, name, details) for (name, details) in sites ]:
+                    f.result()
+        else:
+            for (name, details) in sites:
+                self._get_site_builds(name, details)
+        return True
+
+    def _apply_mirrors(self):
+        for name, details in site_list.items():
+            mirror = self._mirrors.get(name, details.get('mirror', None))
+            if not mirror:
+                continue
+            base = mirror_base_url(mirror)
+            if details.get('index', None) is not None:
+                details['index'] = base + 'index.html'
+            if details.get('download', None) is not None:
+                details['download'] = base + details['download'].rsplit('/', 1)[-1]
+            if self._verbose:
+                print('Use mirror %s for site %s' % (base, name))
+
+    def _load_package_list(self):
+        """Expand the selected packages into build jobs, one for every
+           platform and flavour. A job is named by its repository path
+           below repo/, e.g. cef-78 for the site platform or
+           arm64-minimal/cef-78.
+        """
+        self._build_jobs = {}
+        for name, details in package_list.items():
+            if name not in self._packages:
+                #if self._verbose:
+                    #print('Skip package %s' % name)
+                continue
+            site = site_list.get(details.get('site', None), None)
+            version = details.get('version', None)
+            for platform in self._package_platforms(details):
+                for flavour in details.get('flavours', ['standard']):
+                    arch = cef_platform_arch.get(platform, None)
+                    if arch is None or flavour not in cef_flavours:
+                        print('Invalid platform %s or flavour %s for package %s' % (platform, flavour, name), file=sys.stderr)
+                        continue
+                    if flavour not in cef_packaged_flavours:
+                        print('Flavour %s of package %s cannot be packaged yet, skipped' % (flavour, name), file=sys.stderr)
+                        continue
+                    job = dict(details)
+                    job.update(package=name, platform=platform, flavour=flavour, arch=arch)
+                    if platform == self._site_platform(details) and flavour == 'standard':
+                        job['source'] = 'cef%i' % version
+                        self._build_jobs[name] = job
+                    else:
+                        job_dir = arch if flavour == 'standard' else arch + '-' + flavour
+                        job['source'] = 'cef%i-%s' % (version, job_dir)
+                        self._build_jobs[job_dir + '/' + name] = job
+                    if not site:
+                        continue
+                    site_download = site.get('download', None)
+                    site_builds = site.get('builds', {}).get(platform, None)
+                    site_archive = site.get('archive', None)
+                    builds = []
+                    last_build = None
+                    if site_builds is not None:
+                        for (build_major, build_full_ver) in site_builds:
+                            if build_major == version:
+                                if last_build is None:
+                                    last_build = build_full_ver
+                                builds.append(build_full_ver)
+                    job['builds'] = builds
+                    job['last_build'] = last_build
+
+                    if site_download is not None:
+                        url = site_download
+                        url = url.replace('${platform}', urllib.parse.quote_plus(str(platform)))
+                        url = url.replace('${flavour}', urllib.parse.quote_plus(cef_flavours[flavour]))
+                        if url and site_archive is not None:
+                            url = url.replace('${archive}', urllib.parse.quote_plus(str(site_archive)))
+                        job['site_download_url'] = url
+
+    def _selected_packages(self):
+        ret = []
+        for name, details in sorted(self._build_jobs.items()):
+            if details.get('disable', False):
+                continue
+            ret.append( (name, details) )
+        return ret
+
+    def _list(self):
+        for name, details in site_list.items():
+            print('Site %s' % name)
+            site_download = details.get('download', None)
+            if site_download:
+                url = site_download.replace('${platform}', urllib.parse.quote_plus(str(details.get('platform', 'linux64'))))
+                url = url.replace('${flavour}', urllib.parse.quote_plus(cef_flavours['standard']))
+                if details.get('archive', None) is not None:
+                    url = url.replace('${archive}', urllib.parse.quote_plus(str(details['archive'])))
+                print('  Download: %s' % url)
+
+        for name, details in self._selected_packages():
+            url = details.get('site_download_url')
+            version = details.get('version', None)
+            last_build = details.get('last_build', None)
+            if url:
+                if version is not None:
+                    url = url.replace('${version}', urllib.parse.quote_plus(str(version)))
+                if last_build is not None:
+                    url = url.replace('${last_build}', urllib.parse.quote_plus(str(last_build)))
+
+            print('%s' % name)
+            print('  URL: %s' % url)
+            info = self._archive_version(name, details)
+            if info is not None:
+                print('  Version: %s' % info['version'])
+            #builds = details.get('builds', None)
+            #print('  Builds:')
+            #for b in builds:
+            #    print('    %s' % b)
+        return 0
+
+    def _package_state(self, name):
+        with self._state_lock:
+            state = self._states.get(name, None)
+            if state is None:
+                filename = os.path.join(self._repo_dir, name.lower() + '.state.json')
+                mkdir_p(os.path.dirname(filename))
+                state = package_state(filename)
+                self._states[name] = state
+            return state
+
+    def _skip_stage(self, name, stage, inputs):
+        """Returns True if `stage' of the package already completed with
+           the same `inputs' and may be skipped, unless forced.
+        """
+        if self._force or self._force_extract:
+            return False
+        if not self._package_state(name).unchanged(stage, inputs):
+            return False
+        with self._state_lock:
+            self._skipped.setdefault(name, []).append(stage)
+        trace.count('skipped')
+        if self._verbose:
+            print('%s: %s is up to date' % (name, stage))
+        return True
+
+    def _archive_sha256(self, name, details):
+        url, basename, filename = self._package_download(name, details)
+        return self._cache.get_info(filename, 'sha256')
+
+    def _archive_version(self, name, details):
+        """Returns the version fields of include/cef_version.h in the
+           cached archive of the given package, or None if the archive
+           is not downloaded. The result is kept in the download cache.
+        """
+        url, basename, filename = self._package_download(name, details)
+        info = self._cache.get_info(filename, 'cef_version')
+        if info is None:
+            archive = self._cache.lookup(filename)
+            if archive is None:
+                return None
+            info = probe_archive_cef_version(archive, verbose=self._verbose)
+            if info is not None:
+                self._cache.set_info(filename, 'cef_version', info)
+        return info
+
+    def _package_download(self, name, details):
+        """Returns the download URL, the archive basename and the file
+           name of the given package in the download cache.
+        """
+        site = site_list.get(details.get('site', None), None)
+        url = details.get('site_download_url')
+        version = details.get('version', None)
+        last_build = details.get('last_build', None)
+        if url:
+            if version is not None:
+                url = url.replace('${version}', urllib.parse.quote_plus(str(version)))
+            if last_build is not None:
+                url = url.replace('${last_build}', urllib.parse.quote_plus(str(last_build)))
+            basename = urllib.parse.unquote(os.path.basename(url))
+        else:
+            basename = None
+        site_archive = site.get('archive', None) if site else None
+        if basename is None:
+            if site_archive is None:
+                filename = name.lower()
+                filename += '.zip'
+            elif last_build is not None:
+                filename = name.lower() + '_%s.%s' % (last_build, site_archive)
+            else:
+                filename = name.lower() + '_%s.%s' % (version, site_archive)
+        else:
+            filename = basename
+        return url, basename, filename
+
+    def _fetch_archive(self, url, filename):
+        """Download `url' into the download cache as `filename', verify it
+           against the published SHA-1 and return the cached file.
+        """
+        dest = os.path.join(self._download_dir, filename)
+        if self._force:
+            for f in [dest, dest + '.part']:
+                if os.path.isfile(f):
+                    os.unlink(f)
+        sha256 = hashlib.sha256()
+        sha1 = hashlib.sha1()
+        # fetch the checksum while the archive is downloaded
+        sha1_request = request_sha1(url)
+        if os.path.isfile(dest):
+            # complete download from a run before the cache was used
+            hash_file(dest, [sha256, sha1])
+        else:
+            if self._verbose:
+                print('Download %s...' % url)
+            if self._segments > 1:
+                download_ok = download_file_segmented(url, dest, segments=self._segments, verbose=self._verbose, hashers=[sha256, sha1])
+            else:
+                download_ok = download_file(url, dest, verbose=self._verbose, hashers=[sha256, sha1])
+            if not download_ok:
+                return None
+        try:
+            expected_sha1 = download_sha1(url, request=sha1_request)
+        except IOError as e:
+            # the download is kept and verified again by the next run
+            print('%s' % e, file=sys.stderr)
+            return None
+        if expected_sha1 is not None and expected_sha1 != sha1.hexdigest():
+            print('Checksum mismatch for %s: expected SHA-1 %s, got %s' % (url, expected_sha1, sha1.hexdigest()), file=sys.stderr)
+            os.unlink(dest)
+            return None
+        elif self._verbose and expected_sha1 is not None:
+            print('Verified SHA-1 of %s' % filename)
+        return self._cache.add(filename, dest, sha256.hexdigest(), sha1=sha1.hexdigest(), url=url)
+
+    def _mirror_pkg(self, name, details):
+        """Copy the latest archive of the given package and its SHA-1 into
+           the mirror directory of its site.
+        """
+        print('%s' % name)
+        site_name = details.get('site', None)
+        site = site_list.get(site_name, None)
+        if not site or site.get('download', None) is None:
+            return True
+        url, basename, filename = self._package_download(name, details)
+        if details.get('last_build', None) is None or basename is None:
+            print('No build of %s available' % name, file=sys.stderr)
+            return False
+        site_dir = os.path.join(self._mirror_dir, site_name)
+        mkdir_p(site_dir)
+        dest = os.path.join(site_dir, basename)
+        if os.path.isfile(dest) and os.path.isfile(dest + '.sha1') and not self._force:
+            if self._verbose:
+                print('%s already mirrored' % basename)
+            return True
+        sha1_request = request_sha1(url)
+        sha1 = hashlib.sha1()
+        # an unmodified archive in the download cache saves the download
+        cached = self._cache.lookup(filename) if self._cache.get_info(filename, 'sha1') else None
+        if cached is not None and not self._force:
+            download_ok = copyfile(cached, dest, allow_hardlink=True, verbose=self._verbose)
+            if download_ok:
+                sha1 = None
+                digest = self._cache.get_info(filename, 'sha1')
+        else:
+            download_ok = False
+        if not download_ok:
+            if self._verbose:
+                print('Download %s...' % url)
+            if self._segments > 1:
+                download_ok = download_file_segmented(url, dest, segments=self._segments, verbose=self._verbose, hashers=[sha1])
+            else:
+                download_ok = download_file(url, dest, verbose=self._verbose, hashers=[sha1])
+            if not download_ok:
+                print('Download failed %s' % (name), file=sys.stderr)
+                return False
+            digest = sha1.hexdigest()
+        try:
+            expected_sha1 = download_sha1(url, request=sha1_request)
+        except IOError as e:
+            print('%s' % e, file=sys.stderr)
+            return False
+        if expected_sha1 is not None and expected_sha1 != digest:
+            print('Checksum mismatch for %s: expected SHA-1 %s, got %s' % (url, expected_sha1, digest), file=sys.stderr)
+            os.unlink(dest)
+            return False
+        write_if_changed(dest + '.sha1', (digest + '\n').encode('ascii'))
+        return True
+
+    def _sync_mirror(self):
+        mkdir_p(self._mirror_dir)
+        ret = self._run_pipeline([ ('download', self._mirror_pkg) ])
+        for name in sorted(site_list.keys()):
+            site_dir = os.path.join(self._mirror_dir, name)
+            if os.path.isdir(site_dir):
+                write_mirror_index(site_dir, verbose=self._verbose)
+        return ret
+
+    def _extract_globs(self, name, details):
+        """Returns the archive paths to extract for the given package:
+           either the configured `extract-include' globs or the paths needed
+           by the install files of the configured `extract-packages', both
+           together with the files the cmake install target always
+           installs, or None to extract everything.
+        """
+        include = details.get('extract-include', None)
+        if include is None:
+            binary_packages = details.get('extract-packages', None)
+            if binary_packages is None:
+                return None
+            install_files = []
+            for p in binary_packages:
+                install_files.append(os.path.join(self._debian_dir, p + '.install'))
+            include = install_file_globs(install_files)
+        include = list(include)
+        for glob in cmake_install_globs:
+            if glob not in include:
+                include.append(glob)
+        if self._verbose:
+            print('Extract only %s for %s' % (', '.join(include), name))
+        return include
+
+    def _download_pkg(self, name, details):
+        print('%s' % name)
+        site = site_list.get(details.get('site', None), None)
+        if not site:
+            return True
+        site_download = site.get('download', None)
+        site_archive = site.get('archive', None)
+        if site_download is None:
+            # No download required
+            return True
+
+        last_build = details.get('last_build', None)
+        if last_build is None:
+            print('No build of %s for %s available' % (details.get('package', name), details.get('platform', None)), file=sys.stderr)
+            return False
+        delete_files = details.get('delete-files', [])
+        url, basename, filename = self._package_download(name, details)
+        dest = self._cache.lookup(filename)
+        if dest is not None and self._force:
+            self._cache.remove(filename)
+            dest = None
+        if dest is not None and self._skip_stage(name, 'download', {'last_build': last_build, 'archive': self._cache.get_info(filename, 'sha256')}):
+            return True
+        if dest is None:
+            dest = self._fetch_archive(url, filename)
+        elif self._verbose:
+            print('Download file %s already exists as %s.' % (filename, dest))
+        download_ok = dest is not None
+
+        if download_ok and site_archive and delete_files:
+            prefix = basename
+            if prefix.endswith(site_archive):
+                prefix = prefix[:-len(site_archive) - 1]
+            codec = details.get('repack-codec', self._repack_codec)
+            if codec is None:
+                # keep the compression of the downloaded archive
+                for (c, (ext, commands, stdlib_mode)) in tar_compressors.items():
+                    if archive_extension(filename) == '.' + ext:
+                        codec = c
+            repacked = os.path.join(self._download_dir, prefix + '.' + tar_compressors.get(codec, (codec,))[0])
+            if self._verbose:
+                print('Re-pack %s to %s' % (dest, repacked))
+            # copy the archive members except the deleted files in one pass
+            sha256 = hashlib.sha256()
+            download_ok = filter_tarfile(dest, repacked, delete_files, prefix=prefix, codec=codec, hashers=[sha256], verbose=self._verbose)
+            if not download_ok:
+                print('Failed to create tar archive %s from %s' % (repacked, dest), file=sys.stderr)
+            else:
+                self._cache.add(filename, repacked, sha256.hexdigest(), url=url, extension=archive_extension(repacked))
+
+        if not download_ok:
+            print('Download failed %s' % (name), file=sys.stderr)
+        else:
+            sha256 = self._cache.get_info(filename, 'sha256')
+            self._package_state(name).done('download', {'last_build': last_build, 'archive': sha256},
+                                           last_build=last_build, archive_sha256=sha256)
+        return download_ok
+
+    def _extract_download_pkg(self, name, details):
+        site = site_list.get(details.get('site', None), None)
+        if not site or site.get('download', None) is None:
+            return True
+        site_archive = site.get('archive', None)
+        url, basename, filename = self._package_download(name, details)
+        dest = self._cache.lookup(filename)
+        if dest is None:
+            print('Download file %s is missing' % (filename), file=sys.stderr)
+            return False
+
+        repo_dir = os.path.join(self._repo_dir, name.lower())
+        mkdir_p(repo_dir)
+
+        # Extract all the contents of zip file in different directory
+        prefix = basename
+        if site_archive and prefix.endswith(site_archive):
+            prefix = prefix[:-len(site_archive) - 1]
+        if self._verbose:
+            print('Extract %s to %s (prefix %s)' % (dest, repo_dir, prefix))
+
+        if not extract_archive(dest, repo_dir, prefix=prefix, workers=self._extract_workers,
+                               include=self._extract_globs(name, details), verbose=self._verbose):
+            print('Failed to extract %s to %s' % (dest, repo_dir), file=sys.stderr)
+            return False
+        return True
+
+    def _extract_pkg(self, name, details):
+        site = site_list.get(details.get('site', None), None)
+        site_archive = site.get('archive', None) if site else None
+        version = details.get('version', None)
+        last_build = details.get('last_build', None)
+        url, basename, filename = self._package_download(name, details)
+
+        download_file = self._cache.lookup(filename)
+        if download_file is None:
+            print('Download file %s is missing' % (filename), file=sys.stderr)
+            return False
+
+        repo_dir = os.path.join(self._repo_dir, name.lower())
+        mkdir_p(repo_dir)
+        print('Repository %s ok' % repo_dir)
+
+        debian_package_name = details.get('source', 'cef%i' % version)
+
+        # a re-packed archive may use a different codec than the site
+        orig_file = os.path.join(repo_dir, '../%s_%s.orig%s' % (debian_package_name, last_build, archive_extension(download_file)) )
+        if self._verbose:
+            print('Use orig archive file: %s' % orig_file)
+
+        include = self._extract_globs(name, details)
+        inputs = {'archive': self._archive_sha256(name, details), 'include': include}
+        if os.path.isfile(orig_file) and self._skip_stage(name, 'extract', inputs):
+            return True
+
+        if not os.path.isfile(orig_file):
+            if self._verbose:
+                print('Copy %s to %s' % (download_file, orig_file))
+            if not copyfile(download_file, orig_file, verbose=self._verbose):
+                print('Failed to copy file %s to %s' % (download_file, orig_file), file=sys.stderr)
+                return False
+            # Extract all the contents of zip file in different directory
+            prefix = basename
+            if site_archive and prefix.endswith(site_archive):
+                prefix = prefix[:-len(site_archive) - 1]
+            if self._verbose:
+                print('Extract %s to %s (prefix %s)' % (orig_file, repo_dir, prefix))
+            if not extract_archive(orig_file, repo_dir, prefix=prefix, workers=self._extract_workers,
+                                   include=include, verbose=self._verbose):
+                print('Failed to extract %s to %s' % (orig_file, repo_dir), file=sys.stderr)
+                return False
+        self._package_state(name).done('extract', inputs)
+        return True
+
+    def _configure_pkg(self, name, details):
+        version = details.get('version', None)
+        repo_dir = os.path.join(self._repo_dir, name.lower())
+        repo_debian_dir = os.path.join(repo_dir, 'debian')
+
+        print('Prepare build of %s' % (name.lower()))
+
+        values = { 'cef:ABI': version, 'cef:Arch': details.get('arch', 'amd64'),
+                   'cef:Source': details.get('source', 'cef%i' % version) }
+        ignore = shutil.ignore_patterns('changelog', '.git*')
+        manifest_file = os.path.join(self._repo_dir, name.lower() + '.render.json')
+
+        # the templates are the same for all build jobs
+        with self._changelog_lock:
+            if self._templates_digest is None:
+                self._templates_digest = tree_digest(self._debian_dir, ignore=ignore)
+        state = self._package_state(name)
+        inputs = {'templates': self._templates_digest, 'values': values,
+                  'rendered': files_digest(repo_debian_dir, self._rendered_files(manifest_file))}
+        if not self._skip_stage(name, 'configure', inputs):
+            if not copy_and_configure(self._debian_dir, repo_debian_dir, values=values, ignore=ignore,
+                                      manifest_file=manifest_file, verbose=self._verbose):
+                return False
+            inputs['rendered'] = files_digest(repo_debian_dir, self._rendered_files(manifest_file))
+            state.done('configure', inputs, debian_sha256=inputs['rendered'])
+
+        dch_filename = os.path.join(repo_debian_dir, 'changelog')
+        if not os.path.isfile(dch_filename):
+            # a new build job continues the changelog of the other jobs
+            seed = os.path.join(self._debian_dir, 'changelog')
+            for job_name in self._package_jobs(details):
+                job_changelog = os.path.join(self._repo_dir, job_name.lower(), 'debian/changelog')
+                if os.path.isfile(job_changelog):
+                    seed = job_changelog
+                    break
+            if not self._seed_changelog(seed, dch_filename, values['cef:Source']):
+                return False
+
+        pc_dir = os.path.join(repo_dir, '.pc')
+        if os.path.isdir(pc_dir):
+            if self._verbose:
+                print('Delete directory %s' % (pc_dir))
+            rmdir_p(pc_dir)
+        return True
+
+    def _seed_changelog(self, seed, dch_filename, source):
+        """Start the changelog of a new build job as a copy of `seed' with
+           all entries renamed to the source package of the job.
+        """
+        import debian.changelog
+        try:
+            with open(seed, 'r') as f:
+                dch = debian.changelog.Changelog(f)
+            for block in dch:
+                block.package = source
+            write_if_changed(dch_filename, str(dch).encode('utf-8'))
+        except IOError as e:
+            print('Unable to create %s from %s: %s' % (dch_filename, seed, e), file=sys.stderr)
+            return False
+        if self._verbose:
+            print('Created %s from %s' % (dch_filename, seed))
+        return True
+
+    def _package_jobs(self, details):
+        """Returns the names of all build jobs of the package of a job."""
+        package = details.get('package', None)
+        return [ job_name for (job_name, job) in sorted(self._build_jobs.items()) if job.get('package', None) == package ]
+
+    def _next_debian_version(self, dch_filename, cef_version, strategy):
+        """Returns the version of a new entry for `cef_version' in the
+           given changelog, or None if it cannot be read.
+        """
+        import debian.changelog
+        try:
+            with open(dch_filename, 'r') as f:
+                dch = debian.changelog.Changelog(f)
+        except IOError as e:
+            print('Unable to open %s: %s' % (dch_filename, e), file=sys.stderr)
+            return None
+        old_version = str(dch.version)
+        new_version = cef_version + '-'
+        debian_revision = '0'
+        if old_version.startswith(new_version):
+            debian_revision = old_version[len(new_version):]
+        return new_version + increment_debian_revision(debian_revision, strategy=strategy)
+
+    def _shared_debian_version(self, details, cef_version):
+        """Returns the version of the new changelog entry, which is the
+           highest next version in the changelogs of all build jobs of the
+           package, so every architecture gets the same version.
+        """
+        key = (details.get('package', None), cef_version)
+        with self._changelog_lock:
+            ret = self._changelog_versions.get(key, None)
+            if ret is None:
+                from debian.debian_support import Version
+                strategy = details.get('debian-revision', 'major')
+                for job_name in self._package_jobs(details):
+                    dch_filename = os.path.join(self._repo_dir, job_name.lower(), 'debian/changelog')
+                    if not os.path.isfile(dch_filename):
+                        continue
+                    version = self._next_debian_version(dch_filename, cef_version, strategy)
+                    if version is not None and (ret is None or Version(version) > Version(ret)):
+                        ret = version
+                self._changelog_versions[key] = ret
+        return ret
+
+    def _rendered_files(self, manifest_file):
+        try:
+            with open(manifest_file, 'r') as f:
+                return list(json.load(f).keys())
+        except (IOError, ValueError):
+            return []
+
+    def _changelog_pkg(self, name, details):
+        version = details.get('version', None)
+        repo_dir = os.path.join(self._repo_dir, name.lower())
+        debian_package_name = details.get('source', 'cef%i' % version)
+
+        dch_filename = os.path.join(repo_dir, 'debian/changelog')
+        state = self._package_state(name)
+        inputs = {'archive': self._archive_sha256(name, details), 'debian': state.get('debian_sha256'),
+                  'version': changelog_version(dch_filename)}
+        if self._skip_stage(name, 'changelog', inputs):
+            return True
+
+        debian_package_version = None
+        debian_package_update_ok = False
+        cef_version_info = probe_cef_version(repo_dir, verbose=self._verbose)
+        if cef_version_info is None:
+            return False
+        cef_version = cef_version_info['version']
+
+        commit_msg = 'Automatic update %s' % cef_version
+
+        source_format = None
+        source_format_version = None
+        source_format_filename = os.path.join(repo_dir, 'debian/source/format')
+        try:
+            f = open(source_format_filename, 'r')
+            line = f.readline().strip()
+            m = re_source_format.search(line)
+            if m:
+                source_format_version = m.group(1)
+                source_format = m.group(2)
+            f.close()
+        except IOError as e:
+            print('Unable to open %s: %s' % (source_format_filename, e), file=sys.stderr)
+            pass
+
+        dch_version = None
+        try:
+            import debian.changelog
+            from textwrap import TextWrapper
+            f = open(dch_filename, 'r')
+            dch = debian.changelog.Changelog(f)
+            f.close()
+            # all build jobs of the package get the same version
+            debian_package_version = self._shared_debian_version(details, cef_version)
+            if debian_package_version is None:
+                raise IOError('no changelog of %s readable' % details.get('package', name))
+            # a job seeded from the changelog of another job may already
+            # have the new entry
+            if str(dch.version) != debian_package_version:
+                dch.new_block(
+                    package=debian_package_name,
+                    version=debian_package_version,
+                    distributions=self._distribution,
+                    urgency=dch.urgency,
+                    author="%s <%s>" % debian.changelog.get_maintainer(),
+                    date=debian.changelog.format_date()
+                )
+                wrapper = TextWrapper()
+                wrapper.initial_indent    = "  * "
+                wrapper.subsequent_indent = "    "
+                dch.add_change('')
+                for l in wrapper.wrap(commit_msg):
+                    dch.add_change(l)
+                dch.add_change('')
+                # replaced atomically, other jobs may copy it at any time
+                write_if_changed(dch_filename, str(dch).encode('utf-8'))
+                #print(dch)
+            debian_package_update_ok = True
+        except IOError as e:
+            print('Unable to open %s: %s' % (dch_filename, e), file=sys.stderr)
+            pass
+        if debian_package_update_ok:
+            inputs['version'] = debian_package_version
+            state.done('changelog', inputs, changelog_version=debian_package_version)
+        return debian_package_update_ok
+
+    def _publish_pkg(self, name, details, no_upload=True):
+        repo_dir = os.path.join(self._repo_dir, name.lower())
+        if not os.path.isdir(repo_dir):
+            return True
+        version = changelog_version(os.path.join(repo_dir, 'debian/changelog'))
+        inputs = {'version': version, 'upload': not no_upload}
+        if self._skip_stage(name, 'publish', inputs):
+            return True
+        print('Publish package on PPA from %s' % repo_dir)
+        args = ['ppa_publish']
+        if no_upload:
+            args.append('--noput')
+        from arsoft.utils import runcmdAndGetData
+        try:
+            (sts, stdoutdata, stderrdata) = runcmdAndGetData(args=args, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr, cwd=repo_dir)
+            if sts != 0:
+                print('ppa_publish failed:\n%s' % stderrdata, file=sys.stderr)
+                return False
+        except FileNotFoundError as ex:
+            print('Cannot execute ppa_publish.', file=sys.stderr)
+            return False
+        self._package_state(name).done('publish', inputs, published_version=version)
+        return True
+
+    def _run_pipeline(self, stages):
+        packages = self._selected_packages()
+        # with --jobs 0 all build jobs run at once, bounded by the stage limits
+        jobs = self._jobs if self._jobs > 0 else len(packages)
+        pipeline = package_pipeline(stages, jobs=jobs, stage_limits=self._stage_limits)
+        results = pipeline.run(packages)
+        for name in sorted(self._skipped.keys()):
+            print('%s: skipped unchanged %s' % (name, ', '.join(self._skipped[name])))
+        ret = 0
+        for name, failed_stage in results.items():
+            if failed_stage is None:
+                continue
+            print('Package %s failed in stage %s' % (name, failed_stage), file=sys.stderr)
+            code = pipeline_stage_exit_code.get(failed_stage, 1)
+            if ret == 0 or code < ret:
+                ret = code
+        return ret
+
+    def main(self):
+        #=============================================================================================
+        # process command line
+        #=============================================================================================
+        parser = argparse.ArgumentParser(description='update/generate CEF packages')
+        parser.add_argument('-v', '--verbose', dest='verbose', action='store_true', help='enable verbose output of this script.')
+        parser.add_argument('-f', '--force', dest='force', action='store_true', help='force re-download of packages.')
+        parser.add_argument('-fe', '--force-extract', dest='force_extract', action='store_true', help='force override local source with downloaded package.')
+        parser.add_argument('-l', '--list', dest='list', action='store_true', help='show list of all packages.')
+        parser.add_argument('-np', '--no-publish', dest='no_publish', action='store_true', help='do not publish packages.')
+        parser.add_argument('-d', '--download', dest='download', action='store_true', help='downloads the latest CEF binary packages.')
+        parser.add_argument('-u', '--update', dest='update', action='store_true', help='update the package repositories.')
+        parser.add_argument('-p', '--package', dest='packages', nargs='*', help='select packages to process (default all)')
+        parser.add_argument('--platform', dest='platforms', nargs='*', choices=sorted(cef_platform_arch.keys()), help='select platforms to build (default all platforms of the packages)')
+        parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1, help='number of build jobs to process in parallel, 0 for all at once (default 1).')
+        parser.add_argument('--stage-limit', dest='stage_limits', action='append', default=[], metavar='STAGE=N',
+                            help='limit the number of packages in the given stage (%s) at the same time.' % ', '.join(pipeline_stage_limits.keys()))
+
+        parser.add_argument('--cache-max-size', dest='cache_max_size', metavar='SIZE', help='evict least recently used downloads beyond the given size (e.g. 20G).')
+        parser.add_argument('--cache-max-age', dest='cache_max_age', type=float, metavar='DAYS', help='evict downloads not used for the given number of days.')
+        parser.add_argument('--index-ttl', dest='index_ttl', type=int, default=3600, metavar='SECONDS', help='reuse the cached build index for the given time before revalidating it.')
+        parser.add_argument('--repack-codec', dest='repack_codec', choices=sorted(tar_compressors.keys()), help='compression of archives re-packed for delete-files (default: same as download).')
+        parser.add_argument('--extract-workers', dest='extract_workers', type=int, default=1, help='number of threads writing extracted files.')
+        parser.add_argument('--segments', dest='segments', type=int, default=1, help='download each archive in the given number of concurrent segments.')
+        parser.add_argument('--timeout', dest='timeout', type=float, default=60, metavar='SECONDS', help='timeout of every network operation.')
+        parser.add_argument('--retries', dest='retries', type=int, default=3, help='number of retries of failed requests, with exponential backoff.')
+        parser.add_argument('--connections-per-host', dest='connections_per_host', type=int, default=4, help='maximum number of concurrent requests to one host.')
+        parser.add_argument('--sync-mirror', dest='sync_mirror', metavar='DIR', help='copy the latest builds of the selected packages and a generated index into DIR/<site>.')
+        parser.add_argument('--mirror', dest='mirrors', action='append', default=[], metavar='SITE=URL',
+                            help='read the index and downloads of the given site from a mirror (URL or directory).')
+        parser.add_argument('--trace', dest='trace', metavar='FILE', help='write the timing of the index fetch and every stage as JSON lines, or as Chrome trace if FILE ends with .json.')
+
+        args = parser.parse_args()
+        self._verbose = args.verbose
+        self._force = args.force
+        self._force_extract = args.force_extract
+        self._no_publish = args.no_publish
+        self._jobs = max(0, args.jobs)
+        self._platforms = args.platforms or None
+        self._segments = max(1, args.segments)
+        self._index_ttl = args.index_ttl
+        self._repack_codec = args.repack_codec
+        self._extract_workers = max(1, args.extract_workers)
+        http_client_options.update(timeout=args.timeout, retries=args.retries, per_host=args.connections_per_host, verbose=args.verbose)
+        self._stage_limits = {}
+        for s in args.stage_limits:
+            stage, _, limit = s.partition('=')
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if stage not in pipeline_stage_limits or limit < 1:
+                print('Invalid stage limit %s specified.' % s, file=sys.stderr)
+                return 1
+            self._stage_limits[stage] = limit
+        self._mirrors = {}
+        for s in args.mirrors:
+            site, _, mirror = s.partition('=')
+            if site not in site_list or not mirror:
+                print('Invalid mirror %s specified.' % s, file=sys.stderr)
+                return 1
+            self._mirrors[site] = mirror
+        if args.sync_mirror:
+            self._mirror_dir = os.path.abspath(args.sync_mirror)
+
+        base_dir = os.path.abspath(os.getcwd())
+        self._download_dir = os.path.join(base_dir, 'download')
+        self._repo_dir = os.path.join(base_dir, 'repo')
+        self._debian_dir = os.path.join(base_dir, 'debian')
+        try:
+            cache_max_size = parse_size(args.cache_max_size) if args.cache_max_size else None
+        except ValueError:
+            print('Invalid cache size %s specified.' % args.cache_max_size, file=sys.stderr)
+            return 1
+        cache_max_age = args.cache_max_age * 86400 if args.cache_max_age is not None else None
+        self._cache = download_cache(self._download_dir, max_size=cache_max_size, max_age=cache_max_age, verbose=self._verbose)
+        if args.packages:
+            self._packages = []
+            available_packages = {}
+            for name, details in package_list.items():
+                available_packages[name.lower()] = name
+                alias = details.get('alias', None)
+                if alias is not None:
+                    available_packages[alias.lower()] = name
+            got_unknown_package = False
+            for p in args.packages:
+                pkg_name = p.lower()
+                if pkg_name in available_packages:
+                    real_name = available_packages[pkg_name]
+                    self._packages.append(real_name)
+                else:
+                    got_unknown_package = True
+                    print('Unknown package %s specified.' % p, file=sys.stderr)
+            if got_unknown_package:
+                return 1
+        else:
+            self._packages = package_list.keys()
+
+        try:
+            with trace.span('run', argv=sys.argv[1:]):
+                if self._mirror_dir is None:
+                    # the mirror itself is always synced from upstream
+                    self._apply_mirrors()
+                self._get_latest_revisions()
+                self._load_package_list()
+
+                if args.list:
+                    ret = self._list()
+                elif self._mirror_dir is not None:
+                    ret = self._sync_mirror()
+                    if ret != 0:
+                        ret = 1
+                elif args.download or args.update:
+                    mkdir_p(self._download_dir)
+                    mkdir_p(self._repo_dir)
+                    stages = [ ('download', self._download_pkg) ]
+                    if self._force_extract:
+                        stages.append( ('force-extract', self._extract_download_pkg) )
+                    if not args.download:
+                        try:
+                            import debian
+                        except ImportError:
+                            print('Debian python extension not available. Please install python3-debian.', file=sys.stderr)
+                            return 2
+
+                        from arsoft.inifile import IniFile
+                        lsb_release = IniFile('/etc/lsb-release')
+                        self._distribution = lsb_release.get(None, 'DISTRIB_CODENAME', 'unstable')
+                        lsb_release.close()
+
+                        stages.append( ('extract', self._extract_pkg) )
+                        stages.append( ('configure', self._configure_pkg) )
+                        stages.append( ('changelog', self._changelog_pkg) )
+                        if not self._no_publish:
+                            stages.append( ('publish', self._publish_pkg) )
+                    ret = self._run_pipeline(stages)
+                    self._cache.evict()
+                    if args.download and ret != 0:
+                        ret = 1
+                else:
+                    ret = 0
+        finally:
+            if 'cef_fetch' in sys.modules:
+                sys.modules['cef_fetch'].http_client.close()
+            if args.trace:
+                try:
+                    trace.write(args.trace)
+                except IOError as e:
+                    print('Unable to write trace %s: %s' % (args.trace, e), file=sys.stderr)
+        return ret
+
+
+if __name__ == "__main__":
+    app = cef_package_update_app()
+    sys.exit(app.main())
@@ -0,0 +1,5 @@
+# the updater modules live in the top directory of the repository
+import sys
+import os.path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+#
+# Local HTTP server standing in for the cefbuilds site in the tests.
+import re
+import sys
+import threading
+import http.server
+
+re_range = re.compile(r'bytes=(\d+)-(\d*)$')
+
+class _handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle()
+
+    def do_GET(self):
+        self._handle()
+
+    def _handle(self):
+        server = self.server.mock
+        path = self.path.split('?', 1)[0]
+        with server.lock:
+            server.requests.append( (self.command, path, dict(self.headers.items())) )
+            handler = server.handlers.get(path, None)
+        if handler is not None:
+            handler(self)
+            return
+        data = server.files.get(path, None)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_file(data, ranges=path not in server.no_range)
+
+    def send_file(self, data, ranges=True, headers={}):
+        """Send `data' as response, as 206 or 416 for a Range request."""
+        status = 200
+        start, end = 0, len(data)
+        m = re_range.match(self.headers.get('Range', '')) if ranges else None
+        if m is not None:
+            start = int(m.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%i' % len(data))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if m.group(2):
+                end = min(int(m.group(2)) + 1, len(data))
+            status = 206
+        self.send_response(status)
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %i-%i/%i' % (start, end - 1, len(data)))
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data[start:end])
+
+class _server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients of the tests drop connections on purpose
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        http.server.ThreadingHTTPServer.handle_error(self, request, client_address)
+
+class mock_server(object):
+    """HTTP/1.1 server on a free local port, running in a thread.
+
+       `files' maps URL paths to the served bytes, with Range support
+       unless the path is in `no_range'. `handlers' maps URL paths to
+       functions called with the request handler for custom responses.
+       All requests are recorded in `requests' as (method, path, headers).
+    """
+    def __init__(self):
+        self.files = {}
+        self.no_range = set()
+        self.handlers = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self._server = _server(('127.0.0.1', 0), _handler)
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return 'http://127.0.0.1:%i%s' % (self._server.server_address[1], path)
+
+    def requests_for(self, path):
+        with self.lock:
+            return [ r for r in self.requests if r[1] == path ]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
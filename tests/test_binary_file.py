@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import shutil
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+
+class is_binary_file_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'file')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _is_binary(self, data, block_size=8192):
+        with open(self.filename, 'wb') as f:
+            f.write(data)
+        return cpu.is_binary_file(self.filename, block_size=block_size)
+
+    def test_text(self):
+        self.assertFalse(self._is_binary(b''))
+        self.assertFalse(self._is_binary('Maintainer: Jörg <j@example.org>\n'.encode('utf-8')))
+
+    def test_nul(self):
+        self.assertTrue(self._is_binary(b'text\0text'))
+
+    def test_invalid_utf8(self):
+        self.assertTrue(self._is_binary('Jörg'.encode('latin-1')))
+        self.assertTrue(self._is_binary(b'\x89PNG\r\n\x1a\n'))
+
+    def test_multibyte_at_block_end(self):
+        # a character cut by the end of the first block is still text
+        text = '€'.encode('utf-8')
+        for block_size in range(8, 11):
+            self.assertFalse(self._is_binary(b'x' * 8 + text * 4, block_size=block_size), 'block size %i' % block_size)
+
+    def test_invalid_at_block_end(self):
+        self.assertTrue(self._is_binary(b'x' * 7 + b'\xff', block_size=8))
+        # only the first block is checked
+        self.assertFalse(self._is_binary(b'x' * 8 + b'\xff', block_size=8))
+
+class binary_passthrough_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'debian')
+        self.dst = os.path.join(self.dir, 'out')
+        os.makedirs(os.path.join(self.src, 'patches'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.src, name), 'wb') as f:
+            f.write(data)
+
+    def _read(self, name):
+        with open(os.path.join(self.dst, name), 'rb') as f:
+            return f.read()
+
+    def test_passthrough(self):
+        icon = b'\x89PNG\r\n\x1a\n\0${cef:ABI}\xff'
+        patch = b'+SET(_cef_dir ${CMAKE_SOURCE_DIR})\n+# ${cef:ABI}\n'
+        self._write('icon.png', icon)
+        self._write('patches/do-cmake-install', patch)
+        self._write('control', b'Package: libcef${cef:ABI}\n')
+        self._write('rules', b'ABI := ${cef:ABI}\n')
+        self.assertTrue(cpu.copy_and_configure(self.src, self.dst, values={ 'cef:ABI': 78 }))
+        self.assertEqual(self._read('icon.png'), icon)
+        self.assertEqual(self._read('patches/do-cmake-install'), patch)
+        self.assertEqual(self._read('control'), b'Package: libcef78\n')
+        self.assertEqual(self._read('rules'), b'ABI := 78\n')
+
+if __name__ == '__main__':
+    unittest.main()
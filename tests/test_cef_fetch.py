@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import gc
+import time
+import threading
+import unittest
+
+import cef_fetch
+from mock_server import mock_server
+
+body_data = bytes(range(256)) * 1024
+
+def _redirect(handler):
+    handler.send_response(302)
+    handler.send_header('Location', '/file')
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+def _redirect_loop(handler):
+    handler.send_response(301)
+    handler.send_header('Location', '/loop')
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+def _chunked(handler):
+    handler.send_response(200)
+    handler.send_header('Transfer-Encoding', 'chunked')
+    handler.end_headers()
+    for start in range(0, len(body_data), 100000):
+        chunk = body_data[start:start + 100000]
+        handler.wfile.write(b'%x;ext=1\r\n' % len(chunk) + chunk + b'\r\n')
+    handler.wfile.write(b'0\r\nX-Trailer: yes\r\n\r\n')
+
+def _unavailable(handler):
+    handler.send_response(503)
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+def _slow(handler):
+    time.sleep(2)
+    handler.send_file(b'late')
+
+class flaky_handler(object):
+    """Answers with 503 `failures' times before serving the data."""
+    def __init__(self, failures):
+        self.failures = failures
+
+    def __call__(self, handler):
+        if self.failures > 0:
+            self.failures -= 1
+            _unavailable(handler)
+        else:
+            handler.send_file(body_data)
+
+class http_fetcher_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = mock_server()
+        cls.server.files['/file'] = body_data
+        cls.server.handlers['/redirect'] = _redirect
+        cls.server.handlers['/loop'] = _redirect_loop
+        cls.server.handlers['/chunked'] = _chunked
+        cls.server.handlers['/unavailable'] = _unavailable
+        cls.server.handlers['/slow'] = _slow
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.fetcher = cef_fetch.http_fetcher(per_host=2, timeout=5, retries=0, backoff=0.01)
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_fetch(self):
+        status, headers, body = self.fetcher.fetch(self.server.url('/file'))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-length'], str(len(body_data)))
+        self.assertEqual(body, body_data)
+
+    def test_keep_alive_connection_reused(self):
+        for i in range(3):
+            with self.fetcher.open(self.server.url('/file')) as resp:
+                self.assertEqual(resp.read(), body_data)
+        conns = [ c for conns in self.fetcher._idle.values() for c in conns ]
+        self.assertEqual(len(conns), 1)
+        self.assertTrue(conns[0].reused)
+
+    def test_redirect(self):
+        with self.fetcher.open(self.server.url('/redirect')) as resp:
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(resp.url, self.server.url('/file'))
+            self.assertEqual(resp.read(), body_data)
+
+    def test_too_many_redirects(self):
+        with self.assertRaises(cef_fetch.fetch_error):
+            self.fetcher.open(self.server.url('/loop'))
+        self.assertEqual(len(self.server.requests_for('/loop')), cef_fetch.max_redirects + 1)
+
+    def test_chunked_body(self):
+        with self.fetcher.open(self.server.url('/chunked')) as resp:
+            data = []
+            while True:
+                chunk = resp.read(65536)
+                if not chunk:
+                    break
+                data.append(chunk)
+        self.assertEqual(b''.join(data), body_data)
+
+    def test_retry_unavailable(self):
+        self.server.handlers['/flaky'] = flaky_handler(2)
+        self.fetcher.configure(retries=3)
+        status, headers, body = self.fetcher.fetch(self.server.url('/flaky'))
+        self.assertEqual(status, 200)
+        self.assertEqual(body, body_data)
+        self.assertEqual(len(self.server.requests_for('/flaky')), 3)
+
+    def test_retries_exhausted(self):
+        self.fetcher.configure(retries=2)
+        with self.assertRaises(cef_fetch.fetch_error) as cm:
+            self.fetcher.open(self.server.url('/unavailable'))
+        self.assertEqual(cm.exception.status, 503)
+        self.assertEqual(len(self.server.requests_for('/unavailable')), 3)
+
+    def test_range(self):
+        with self.fetcher.open(self.server.url('/file'), headers={ 'Range': 'bytes=1000-1999' }) as resp:
+            self.assertEqual(resp.status, 206)
+            self.assertEqual(resp.headers['Content-Range'], 'bytes 1000-1999/%i' % len(body_data))
+            self.assertEqual(resp.read(), body_data[1000:2000])
+
+    def test_range_not_satisfiable(self):
+        with self.assertRaises(cef_fetch.fetch_error) as cm:
+            self.fetcher.open(self.server.url('/file'), headers={ 'Range': 'bytes=%i-' % len(body_data) })
+        self.assertEqual(cm.exception.status, 416)
+        self.assertEqual(cm.exception.headers['Content-Range'], 'bytes */%i' % len(body_data))
+
+    def test_not_found(self):
+        with self.assertRaises(cef_fetch.fetch_error) as cm:
+            self.fetcher.open(self.server.url('/missing'))
+        self.assertEqual(cm.exception.status, 404)
+
+    def test_timeout(self):
+        self.fetcher.configure(timeout=0.5)
+        with self.assertRaises(cef_fetch.fetch_error):
+            self.fetcher.open(self.server.url('/slow'))
+
+    def test_dropped_response_releases_slot(self):
+        self.fetcher.configure(per_host=1)
+        resp = self.fetcher.open(self.server.url('/file'))
+        del resp
+        gc.collect()
+        with self.fetcher.open(self.server.url('/file')) as resp:
+            self.assertEqual(resp.read(), body_data)
+
+    def test_closed_response_releases_slot(self):
+        self.fetcher.configure(per_host=1)
+        resp = self.fetcher.open(self.server.url('/file'))
+        resp.read(10)
+        resp.close()
+        with self.fetcher.open(self.server.url('/file')) as resp:
+            self.assertEqual(resp.read(), body_data)
+
+    def test_wait_for_stalled_slot_times_out(self):
+        self.fetcher.configure(per_host=1, timeout=0.5)
+        with self.fetcher.open(self.server.url('/file')) as held:
+            with self.assertRaises(cef_fetch.fetch_error):
+                self.fetcher.open(self.server.url('/file'))
+
+    def test_wait_for_busy_slot(self):
+        # a slot held longer than the timeout by a request which makes
+        # progress is waited for
+        self.fetcher.configure(per_host=1, timeout=0.5)
+        held = self.fetcher.open(self.server.url('/file'))
+        def _read_slowly():
+            while held.read(len(body_data) // 8):
+                time.sleep(0.2)
+            held.close()
+        reader = threading.Thread(target=_read_slowly)
+        reader.start()
+        try:
+            status, headers, body = self.fetcher.fetch(self.server.url('/file'))
+        finally:
+            reader.join()
+        self.assertEqual(body, body_data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import io
+import os
+import json
+import shutil
+import tarfile
+import tempfile
+import unittest
+import hashlib
+import zipfile
+from unittest import mock
+
+import cef_package_update as cpu
+
+version_h = b'''// Copyright (c) 2020 Marshall A. Greenblatt. All rights reserved.
+#ifndef CEF_INCLUDE_CEF_VERSION_H_
+#define CEF_INCLUDE_CEF_VERSION_H_
+
+#define CEF_VERSION "78.3.9+gc2b7bc3+chromium-78.0.3904.108"
+#define CEF_VERSION_MAJOR 78
+#define CEF_VERSION_MINOR 3
+#define CEF_VERSION_PATCH 9
+#define CEF_COMMIT_NUMBER 2233
+#define CEF_COMMIT_HASH "c2b7bc3ef5ef7c2d0c9e0de6b1f3a9d6a3d2d2a4"
+#define COPYRIGHT_YEAR 2020
+
+#define CHROME_VERSION_MAJOR 78
+#define CHROME_VERSION_MINOR 0
+#define CHROME_VERSION_BUILD 3904
+#define CHROME_VERSION_PATCH 108
+
+#endif  // CEF_INCLUDE_CEF_VERSION_H_
+'''
+
+top_dir = 'cef_binary_78.3.9+gc2b7bc3+chromium-78.0.3904.108_linux64_minimal'
+
+class cef_version_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _repo(self):
+        repo_dir = os.path.join(self.dir, 'cef-78')
+        os.makedirs(os.path.join(repo_dir, 'include'))
+        os.makedirs(os.path.join(repo_dir, 'debian'))
+        with open(os.path.join(repo_dir, 'include', 'cef_version.h'), 'wb') as f:
+            f.write(version_h)
+        return repo_dir
+
+    def _archive(self, members, name='cef.tar.bz2'):
+        archive = os.path.join(self.dir, name)
+        if name.endswith('.zip'):
+            with zipfile.ZipFile(archive, 'w') as zipObj:
+                for (member, data) in members:
+                    zipObj.writestr(member, data)
+        else:
+            with tarfile.open(archive, 'w:bz2') as tarObj:
+                for (member, data) in members:
+                    tarinfo = tarfile.TarInfo(member)
+                    tarinfo.size = len(data)
+                    tarObj.addfile(tarinfo, io.BytesIO(data))
+        return archive
+
+    def test_parse(self):
+        info = cpu.parse_cef_version_h(version_h)
+        self.assertEqual(info['version'], '78.3.9+gc2b7bc3+chromium-78.0.3904.108')
+        self.assertEqual(info['major'], 78)
+        self.assertEqual(info['commit_number'], 2233)
+        self.assertEqual(info['commit_hash'], 'c2b7bc3ef5ef7c2d0c9e0de6b1f3a9d6a3d2d2a4')
+        self.assertEqual(info['chromium_version'], '78.0.3904.108')
+        self.assertNotIn('copyright_year', info)
+
+    def test_parse_no_version(self):
+        self.assertIsNone(cpu.parse_cef_version_h(b'#define CEF_VERSION_MAJOR 78\n'))
+
+    def test_probe_sidecar(self):
+        repo_dir = self._repo()
+        info = cpu.probe_cef_version(repo_dir)
+        sidecar = os.path.join(repo_dir, 'debian', 'cef_version.json')
+        with open(sidecar, 'r') as f:
+            self.assertEqual(json.load(f), info)
+        self.assertIn('\n "major": 78,\n', open(sidecar).read())
+
+    def test_probe_touched_header_keeps_sidecar(self):
+        repo_dir = self._repo()
+        cpu.probe_cef_version(repo_dir)
+        sidecar = os.path.join(repo_dir, 'debian', 'cef_version.json')
+        os.utime(sidecar, ns=(1500000000000000000, 1500000000000000000))
+        # a re-extract gives the header a new mtime but the same content
+        os.utime(os.path.join(repo_dir, 'include', 'cef_version.h'))
+        self.assertEqual(cpu.probe_cef_version(repo_dir)['major'], 78)
+        self.assertEqual(os.stat(sidecar).st_mtime_ns, 1500000000000000000)
+
+    def test_probe_missing_header(self):
+        self.assertIsNone(cpu.probe_cef_version(self.dir))
+
+    def test_probe_archive_tar(self):
+        archive = self._archive([
+            (top_dir + '/README.txt', b'readme'),
+            (top_dir + '/include/cef_version.h', version_h),
+            (top_dir + '/include/cef_app.h', b''),
+            ])
+        info = cpu.probe_archive_cef_version(archive, parallel=False)
+        self.assertEqual(info['major'], 78)
+
+    def test_probe_archive_zip(self):
+        archive = self._archive([ (top_dir + '/include/cef_version.h', version_h) ], name='cef.zip')
+        self.assertEqual(cpu.probe_archive_cef_version(archive)['chromium_version'], '78.0.3904.108')
+
+    def test_probe_archive_nested_header_ignored(self):
+        archive = self._archive([ (top_dir + '/tests/include/cef_version.h', version_h) ])
+        self.assertIsNone(cpu.probe_archive_cef_version(archive, parallel=False))
+
+class archive_version_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.app = cpu.cef_package_update_app()
+        self.app._cache = cpu.download_cache(os.path.join(self.dir, 'download'))
+        self.filename = top_dir + '.tar.bz2'
+        self.details = { 'site_download_url': 'http://example.com/' + self.filename }
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _add_archive(self):
+        archive = os.path.join(self.dir, 'archive.part')
+        with tarfile.open(archive, 'w:bz2') as tarObj:
+            tarinfo = tarfile.TarInfo(top_dir + '/include/cef_version.h')
+            tarinfo.size = len(version_h)
+            tarObj.addfile(tarinfo, io.BytesIO(version_h))
+        with open(archive, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        self.app._cache.add(self.filename, archive, sha256)
+
+    def test_not_downloaded(self):
+        self.assertIsNone(self.app._archive_version('cef-78', self.details))
+
+    def test_probed_once(self):
+        self._add_archive()
+        self.assertEqual(self.app._archive_version('cef-78', self.details)['major'], 78)
+        self.assertEqual(self.app._cache.get_info(self.filename, 'cef_version')['major'], 78)
+        with mock.patch.object(cpu, 'probe_archive_cef_version') as probe:
+            info = cpu.download_cache(os.path.join(self.dir, 'download')).get_info(self.filename, 'cef_version')
+            self.assertEqual(self.app._archive_version('cef-78', self.details), info)
+            self.assertFalse(probe.called)
+
+if __name__ == '__main__':
+    unittest.main()
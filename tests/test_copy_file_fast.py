@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cef_package_update as cpu
+
+file_data = os.urandom(300000)
+
+def _failing(*args, **kwargs):
+    raise OSError(95, 'Operation not supported')
+
+class copy_file_fast_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'libcef.so')
+        self.dst = os.path.join(self.dir, 'copy.so')
+        with open(self.src, 'wb') as f:
+            f.write(file_data)
+        os.utime(self.src, ns=(1500000000000000000, 1500000000000000000))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _read(self, filename):
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def _check_copy(self):
+        self.assertEqual(self._read(self.dst), file_data)
+        self.assertEqual(os.stat(self.dst).st_mtime_ns, os.stat(self.src).st_mtime_ns)
+        self.assertFalse(os.path.samefile(self.src, self.dst))
+
+    def test_copy(self):
+        strategy = cpu.copy_file_fast(self.src, self.dst)
+        self.assertIn(strategy, ['reflink', 'copy_file_range', 'sendfile', 'buffered'])
+        self._check_copy()
+
+    def test_copy_file_range_fallback(self):
+        with mock.patch.object(cpu, 'fcntl', None):
+            self.assertEqual(cpu.copy_file_fast(self.src, self.dst), 'copy_file_range')
+        self._check_copy()
+
+    def test_sendfile_fallback(self):
+        with mock.patch.object(cpu, 'fcntl', None), mock.patch.object(os, 'copy_file_range', _failing):
+            self.assertEqual(cpu.copy_file_fast(self.src, self.dst), 'sendfile')
+        self._check_copy()
+
+    def test_buffered_fallback(self):
+        with mock.patch.object(cpu, 'fcntl', None), mock.patch.object(os, 'copy_file_range', _failing), \
+                mock.patch.object(os, 'sendfile', _failing):
+            self.assertEqual(cpu.copy_file_fast(self.src, self.dst), 'buffered')
+        self._check_copy()
+
+    def test_overwrite_larger_file(self):
+        with open(self.dst, 'wb') as f:
+            f.write(b'x' * (len(file_data) * 2))
+        with mock.patch.object(cpu, 'fcntl', None), mock.patch.object(os, 'copy_file_range', _failing):
+            cpu.copy_file_fast(self.src, self.dst)
+        self._check_copy()
+
+    def test_hardlink(self):
+        self.assertEqual(cpu.copy_file_fast(self.src, self.dst, allow_hardlink=True), 'hardlink')
+        self.assertTrue(os.path.samefile(self.src, self.dst))
+
+    def test_same_path(self):
+        for allow_hardlink in [False, True]:
+            with self.assertRaises(shutil.SameFileError):
+                cpu.copy_file_fast(self.src, self.src, allow_hardlink=allow_hardlink)
+            self.assertEqual(self._read(self.src), file_data)
+
+    def test_existing_hardlink(self):
+        os.link(self.src, self.dst)
+        self.assertEqual(cpu.copy_file_fast(self.src, self.dst, allow_hardlink=True), 'hardlink')
+        with self.assertRaises(shutil.SameFileError):
+            cpu.copy_file_fast(self.src, self.dst)
+        self.assertEqual(self._read(self.src), file_data)
+
+if __name__ == '__main__':
+    unittest.main()
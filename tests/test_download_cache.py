@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+
+class download_cache_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'download')
+        self.index_file = os.path.join(self.cache_dir, 'index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _cache(self, **kwargs):
+        return cpu.download_cache(self.cache_dir, **kwargs)
+
+    def _add(self, cache, name, data):
+        filename = os.path.join(self.dir, name + '.part')
+        with open(filename, 'wb') as f:
+            f.write(data)
+        return cache.add(name, filename, hashlib.sha256(data).hexdigest(), url='http://example.com/' + name)
+
+    def _objects(self):
+        return sorted(os.listdir(os.path.join(self.cache_dir, 'objects')))
+
+    def _index(self):
+        with open(self.index_file, 'r') as f:
+            return json.load(f)
+
+    def test_add_and_lookup(self):
+        cache = self._cache()
+        path = self._add(cache, 'cef_78.tar.bz2', b'archive')
+        self.assertTrue(path.endswith('.tar.bz2'))
+        self.assertEqual(cache.lookup('cef_78.tar.bz2'), path)
+        self.assertEqual(cache.get_info('cef_78.tar.bz2', 'sha256'), hashlib.sha256(b'archive').hexdigest())
+        # a new instance reads the index
+        self.assertEqual(self._cache().lookup('cef_78.tar.bz2'), path)
+        self.assertIsNone(cache.lookup('missing.tar.bz2'))
+
+    def test_same_content_shares_object(self):
+        cache = self._cache()
+        self.assertEqual(self._add(cache, 'a.tar.bz2', b'same'), self._add(cache, 'b.tar.bz2', b'same'))
+        self.assertEqual(len(self._objects()), 1)
+        cache.remove('a.tar.bz2')
+        self.assertEqual(len(self._objects()), 1)
+        cache.remove('b.tar.bz2')
+        self.assertEqual(self._objects(), [])
+
+    def test_lookup_does_not_write_index(self):
+        cache = self._cache()
+        self._add(cache, 'cef_78.tar.bz2', b'archive')
+        mtime = os.stat(self.index_file).st_mtime_ns
+        last_used = self._index()['cef_78.tar.bz2']['last_used']
+        os.utime(self.index_file, ns=(mtime - 10**9, mtime - 10**9))
+        cache = self._cache()
+        self.assertIsNotNone(cache.lookup('cef_78.tar.bz2'))
+        self.assertEqual(os.stat(self.index_file).st_mtime_ns, mtime - 10**9)
+        # the last use is written by evict()
+        cache.evict()
+        self.assertGreaterEqual(self._index()['cef_78.tar.bz2']['last_used'], last_used)
+
+    def test_damaged_entry(self):
+        cache = self._cache()
+        path = self._add(cache, 'cef_78.tar.bz2', b'archive')
+        with open(path, 'ab') as f:
+            f.write(b'garbage')
+        self.assertIsNone(cache.lookup('cef_78.tar.bz2'))
+        self.assertNotIn('cef_78.tar.bz2', self._index())
+        self.assertEqual(self._objects(), [])
+
+    def test_missing_object(self):
+        cache = self._cache()
+        os.unlink(self._add(cache, 'cef_78.tar.bz2', b'archive'))
+        self.assertIsNone(cache.lookup('cef_78.tar.bz2'))
+        self.assertNotIn('cef_78.tar.bz2', self._index())
+
+    def test_evict_max_size(self):
+        cache = self._cache()
+        for (i, name) in enumerate(['old.tar.bz2', 'mid.tar.bz2', 'new.tar.bz2']):
+            self._add(cache, name, bytes([i]) * 100)
+        index = self._index()
+        for (i, name) in enumerate(['old.tar.bz2', 'mid.tar.bz2', 'new.tar.bz2']):
+            index[name]['last_used'] = 1000 + i
+        with open(self.index_file, 'w') as f:
+            json.dump(index, f)
+        cache = self._cache(max_size=250)
+        self.assertEqual(cache.evict(), 100)
+        self.assertEqual(sorted(self._index().keys()), ['mid.tar.bz2', 'new.tar.bz2'])
+        self.assertEqual(len(self._objects()), 2)
+
+    def test_evict_keeps_used_archives(self):
+        cache = self._cache(max_age=0)
+        self._add(cache, 'used.tar.bz2', b'used')
+        self._add(self._cache(), 'other.tar.bz2', b'other')
+        cache = self._cache(max_age=0)
+        cache.lookup('used.tar.bz2')
+        cache.evict()
+        self.assertEqual(list(self._index().keys()), ['used.tar.bz2'])
+
+    def test_evict_sweeps_unreferenced_objects(self):
+        cache = self._cache()
+        self._add(cache, 'cef_78.tar.bz2', b'archive')
+        with open(os.path.join(self.cache_dir, 'objects', 'leftover.tar.bz2'), 'wb') as f:
+            f.write(b'x' * 10)
+        self.assertEqual(cache.evict(), 10)
+        self.assertEqual(len(self._objects()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
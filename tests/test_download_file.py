@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+import cef_package_update as cpu
+from mock_server import mock_server
+
+archive_data = bytes(range(256)) * 4096
+
+def _truncated(handler):
+    handler.send_response(200)
+    handler.send_header('Content-Length', str(len(archive_data)))
+    handler.end_headers()
+    handler.wfile.write(archive_data[:1000])
+    handler.close_connection = True
+
+def _unavailable(handler):
+    handler.send_response(503)
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+class download_file_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cpu.http_client_options.update(timeout=5, retries=0, backoff=0.01)
+        cls.server = mock_server()
+        cls.server.files['/cef.tar.bz2'] = archive_data
+        cls.server.files['/norange.tar.bz2'] = archive_data
+        cls.server.no_range.add('/norange.tar.bz2')
+        cls.server.handlers['/truncated.tar.bz2'] = _truncated
+        cls.server.files['/cef.tar.bz2.sha1'] = (hashlib.sha1(archive_data).hexdigest() + '  cef.tar.bz2\n').encode('ascii')
+        cls.server.handlers['/norange.tar.bz2.sha1'] = _unavailable
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cpu.get_http_client().close()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dest = os.path.join(self.dir, 'cef.tar.bz2')
+        self.part = self.dest + '.part'
+        with self.server.lock:
+            del self.server.requests[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _read(self, filename):
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def _download(self, path):
+        sha1 = hashlib.sha1()
+        ok = cpu.download_file(self.server.url(path), self.dest, chunk_size=64*1024, hashers=[sha1])
+        return ok, sha1.hexdigest()
+
+    def test_download_renames_part_file(self):
+        ok, sha1 = self._download('/cef.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertFalse(os.path.exists(self.part))
+        self.assertEqual(sha1, hashlib.sha1(archive_data).hexdigest())
+
+    def test_resume_partial_file(self):
+        with open(self.part, 'wb') as f:
+            f.write(archive_data[:300000])
+        ok, sha1 = self._download('/cef.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertFalse(os.path.exists(self.part))
+        # the hash covers the part downloaded before
+        self.assertEqual(sha1, hashlib.sha1(archive_data).hexdigest())
+        self.assertEqual(self.server.requests_for('/cef.tar.bz2')[-1][2].get('Range'), 'bytes=300000-')
+
+    def test_complete_part_file_416(self):
+        with open(self.part, 'wb') as f:
+            f.write(archive_data)
+        ok, sha1 = self._download('/cef.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertFalse(os.path.exists(self.part))
+        self.assertEqual(sha1, hashlib.sha1(archive_data).hexdigest())
+
+    def test_oversized_part_file_416(self):
+        with open(self.part, 'wb') as f:
+            f.write(archive_data + b'garbage')
+        ok, sha1 = self._download('/cef.tar.bz2')
+        self.assertFalse(ok)
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_range_ignored_restarts(self):
+        with open(self.part, 'wb') as f:
+            f.write(b'x' * 1000)
+        ok, sha1 = self._download('/norange.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertEqual(sha1, hashlib.sha1(archive_data).hexdigest())
+
+    def test_not_found(self):
+        ok, sha1 = self._download('/missing.tar.bz2')
+        self.assertFalse(ok)
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_interrupted_keeps_part_file(self):
+        ok, sha1 = self._download('/truncated.tar.bz2')
+        self.assertFalse(ok)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertEqual(self._read(self.part), archive_data[:1000])
+
+    def _download_segmented(self, path, segments=4):
+        sha1 = hashlib.sha1()
+        sha256 = hashlib.sha256()
+        ok = cpu.download_file_segmented(self.server.url(path), self.dest, segments=segments, chunk_size=10000,
+                                         min_segment_size=100000, hashers=[sha1, sha256])
+        return ok, sha1.hexdigest(), sha256.hexdigest()
+
+    def test_segmented_hashes_while_streaming(self):
+        with mock.patch.object(cpu, 'hash_file', side_effect=AssertionError('second pass over the file')):
+            ok, sha1, sha256 = self._download_segmented('/cef.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertEqual(sha1, hashlib.sha1(archive_data).hexdigest())
+        self.assertEqual(sha256, hashlib.sha256(archive_data).hexdigest())
+        ranges = [ r[2].get('Range') for r in self.server.requests_for('/cef.tar.bz2') if r[0] == 'GET' ]
+        self.assertEqual(len(ranges), 4)
+
+    def test_segmented_without_ranges(self):
+        ok, sha1, sha256 = self._download_segmented('/norange.tar.bz2')
+        self.assertTrue(ok)
+        self.assertEqual(self._read(self.dest), archive_data)
+        self.assertEqual(sha256, hashlib.sha256(archive_data).hexdigest())
+
+    def test_sha1(self):
+        self.assertEqual(cpu.download_sha1(self.server.url('/cef.tar.bz2')), hashlib.sha1(archive_data).hexdigest())
+
+    def test_sha1_not_provided(self):
+        self.assertIsNone(cpu.download_sha1(self.server.url('/truncated.tar.bz2')))
+
+    def test_sha1_unavailable_raises(self):
+        with self.assertRaises(IOError):
+            cpu.download_sha1(self.server.url('/norange.tar.bz2'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+
+prefix = 'cef_binary_78.3.9_linux64'
+
+class filter_tarfile_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'src.tar.bz2')
+        self.dest = os.path.join(self.dir, 'dest.tar.bz2')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _make(self, members, top=prefix):
+        with tarfile.open(self.src, 'w:bz2') as tarObj:
+            for (name, data) in members:
+                tarinfo = tarfile.TarInfo(top + '/' + name)
+                if isinstance(data, bytes):
+                    tarinfo.size = len(data)
+                    tarObj.addfile(tarinfo, io.BytesIO(data))
+                else:
+                    tarinfo.type = tarfile.LNKTYPE
+                    tarinfo.linkname = top + '/' + data[0]
+                    tarObj.addfile(tarinfo)
+
+    def _filter(self, delete_files):
+        self.assertTrue(cpu.filter_tarfile(self.src, self.dest, delete_files, prefix=prefix, codec='bz2'))
+        ret = {}
+        with tarfile.open(self.dest, 'r:bz2') as tarObj:
+            for member in tarObj:
+                if member.islnk():
+                    ret[member.name] = ('link', member.linkname)
+                else:
+                    ret[member.name] = tarObj.extractfile(member).read()
+        return ret
+
+    def test_delete(self):
+        self._make([ ('README.txt', b'readme'), ('Release/libcef.so', b'lib'), ('Release/libGLESv2.so', b'gles') ])
+        members = self._filter([ '/Release/libGLESv2.so' ])
+        self.assertEqual(members, {
+            prefix + '/README.txt': b'readme',
+            prefix + '/Release/libcef.so': b'lib',
+            })
+
+    def test_dot_prefixed_members(self):
+        self._make([ ('README.txt', b'readme'), ('Release/libcef.so', b'lib') ], top='./' + prefix)
+        members = self._filter([ 'Release/libcef.so' ])
+        self.assertEqual(list(members.keys()), [ './' + prefix + '/README.txt' ])
+
+    def test_deleted_link_target(self):
+        self._make([
+            ('Release/libEGL.so', b'egl'),
+            ('Release/libEGL.so.1', ('Release/libEGL.so',)),
+            ('Debug/libEGL.so', ('Release/libEGL.so',)),
+            ('Release/libcef.so', b'lib'),
+            ('Debug/libcef.so', ('Release/libcef.so',)),
+            ])
+        members = self._filter([ 'Release/libEGL.so' ])
+        self.assertEqual(members, {
+            prefix + '/Release/libEGL.so.1': b'egl',
+            prefix + '/Debug/libEGL.so': ('link', prefix + '/Release/libEGL.so.1'),
+            prefix + '/Release/libcef.so': b'lib',
+            prefix + '/Debug/libcef.so': ('link', prefix + '/Release/libcef.so'),
+            })
+
+if __name__ == '__main__':
+    unittest.main()
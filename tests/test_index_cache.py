@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+from mock_server import mock_server
+
+def make_index(majors, platforms=['linux64', 'linuxarm64']):
+    rows = []
+    for platform in platforms:
+        rows.append('<table id="%s">' % platform)
+        for major in majors:
+            for patch in [2, 1]:
+                version = '%i.0.%i+g%07x+chromium-%i.0.3945.%i' % (major, patch, major * 10 + patch, major, patch)
+                rows.append('<tr class="toprow" data-version="%s"><td>%s</td></tr>' % (version, version))
+        rows.append('</table>')
+    return ('<html><body>\n' + '\n'.join(rows) + '\n</body></html>\n').encode('utf-8')
+
+index_data = make_index(range(90, 70, -1))
+index_etag = '"index-1"'
+
+def _index(handler):
+    if handler.headers.get('If-None-Match') == index_etag:
+        handler.send_response(304)
+        handler.send_header('ETag', index_etag)
+        handler.end_headers()
+        return
+    handler.send_file(index_data, ranges=False, headers={ 'ETag': index_etag })
+
+class index_cache_test(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cpu.http_client_options.update(timeout=5, retries=0, backoff=0.01)
+        cls.server = mock_server()
+        cls.server.handlers['/index.html'] = _index
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cpu.get_http_client().close()
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.dir, 'index-spotify.json')
+        self.url = self.server.url('/index.html')
+        with self.server.lock:
+            del self.server.requests[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _get(self, majors=None, ttl=3600, platforms=['linux64']):
+        return cpu.get_spotify_builds(self.url, platforms=platforms, cache_file=self.cache_file, ttl=ttl, majors=majors)
+
+    def _requests(self):
+        return self.server.requests_for('/index.html')
+
+    def _majors(self, builds, platform='linux64'):
+        return set([ major for (major, version) in builds[platform] ])
+
+    def test_cached_within_ttl(self):
+        builds = self._get()
+        self.assertEqual(len(builds['linux64']), 40)
+        self.assertEqual(self._get(), builds)
+        self.assertEqual(len(self._requests()), 1)
+
+    def test_revalidate_not_modified(self):
+        builds = self._get(ttl=0)
+        self.assertEqual(self._get(ttl=0), builds)
+        requests = self._requests()
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn('If-None-Match', requests[0][2])
+        self.assertEqual(requests[1][2].get('If-None-Match'), index_etag)
+        with open(self.cache_file, 'r') as f:
+            self.assertEqual(json.load(f)['etag'], index_etag)
+
+    def test_majors_subset_uses_cache(self):
+        builds = self._get(majors=[78, 79])
+        self.assertTrue(set([78, 79]).issubset(self._majors(builds)))
+        self.assertEqual(self._get(majors=[78]), builds)
+        self.assertEqual(len(self._requests()), 1)
+
+    def test_other_majors_scan_both(self):
+        self._get(majors=[85])
+        builds = self._get(majors=[78])
+        self.assertTrue(set([78, 85]).issubset(self._majors(builds)))
+        requests = self._requests()
+        self.assertEqual(len(requests), 2)
+        # the cached builds lack major 78, so they cannot be revalidated
+        self.assertNotIn('If-None-Match', requests[1][2])
+        with open(self.cache_file, 'r') as f:
+            self.assertEqual(json.load(f)['majors'], [78, 85])
+        self._get(majors=[85])
+        self.assertEqual(len(self._requests()), 2)
+
+    def test_full_scan_covers_majors(self):
+        self._get()
+        builds = self._get(majors=[72])
+        self.assertIn(72, self._majors(builds))
+        self.assertEqual(len(self._requests()), 1)
+
+    def test_other_platforms_refetch(self):
+        self._get()
+        builds = self._get(platforms=['linux64', 'linuxarm64'])
+        self.assertEqual(len(builds['linuxarm64']), 40)
+        self.assertEqual(len(self._requests()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
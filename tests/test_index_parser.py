@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import unittest
+
+import cef_package_update as cpu
+
+index_page = '''<html><head><title>CEF Automated Builds – Spotify</title></head><body>
+<table id="linux64">
+<tr class="toprow" data-version="80.0.4+g74f7b0c+chromium-80.0.3987.122"><td>80.0.4 – “stable”</td></tr>
+<tr class="subrow"><td><table><tr class="toprow" data-version="1.0.0"><td>nested</td></tr></table></td></tr>
+<TR CLASS='toprow' DATA-VERSION='79.1.36+g90301bd+chromium-79.0.3945.130'><td>79</td></TR>
+<tr class="toprow" data-version="78.3.9+gc2b7bc3+chromium-78.0.3904.108&#x20;"><td>78</td></tr>
+<tr class="toprow" data-version="77.1.18+g8e8d602+chromium-77.0.3865.120"><td>77</td></tr>
+</table>
+<table id="linuxarm64">
+<tr class="toprow" data-version="80.0.4+g74f7b0c+chromium-80.0.3987.122"><td>80</td></tr>
+</table>
+</body></html>
+'''.encode('utf-8')
+
+linux64_builds = [
+    (80, '80.0.4+g74f7b0c+chromium-80.0.3987.122'),
+    (79, '79.1.36+g90301bd+chromium-79.0.3945.130'),
+    (78, '78.3.9+gc2b7bc3+chromium-78.0.3904.108 '),
+    (77, '77.1.18+g8e8d602+chromium-77.0.3865.120'),
+]
+
+class _counting_chunks(object):
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.read = 0
+
+    def __iter__(self):
+        for i in range(0, len(self.data), self.chunk_size):
+            self.read += 1
+            yield self.data[i:i + self.chunk_size]
+
+class index_parser_test(unittest.TestCase):
+    def test_whole_page(self):
+        self.assertEqual(cpu.extract_builds(index_page), linux64_builds)
+        self.assertEqual(cpu.extract_builds(index_page.decode('utf-8')), linux64_builds)
+
+    def test_chunk_boundaries(self):
+        # every split position, inside tags, attribute values, entities
+        # and multi-byte UTF-8 characters
+        for chunk_size in range(1, 80):
+            builds = cpu.extract_platform_builds(index_page, [ 'linux64', 'linuxarm64' ], chunk_size=chunk_size)
+            self.assertEqual(builds['linux64'], linux64_builds, 'chunk size %i' % chunk_size)
+            self.assertEqual(builds['linuxarm64'], linux64_builds[:1], 'chunk size %i' % chunk_size)
+
+    def test_split_tag(self):
+        parser = cpu.spotify_index_parser('linux64')
+        for text in [ '<table id="lin', 'ux64"><', 'tr class="toprow" data-ver', 'sion="78.3.9">', '</tr></table>' ]:
+            parser.feed(text)
+        self.assertEqual(parser.builds, [ (78, '78.3.9') ])
+        self.assertTrue(parser.done)
+
+    def test_missing_platform(self):
+        self.assertEqual(cpu.extract_builds(index_page, platform='windows64'), [])
+
+    def test_majors_stop_early(self):
+        chunks = _counting_chunks(index_page, 16)
+        builds = cpu.extract_builds(chunks, majors=[ 80, 79 ])
+        self.assertEqual(builds, linux64_builds[:2])
+        self.assertLess(chunks.read, len(index_page) // 16)
+
+if __name__ == '__main__':
+    unittest.main()
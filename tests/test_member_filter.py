@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import tarfile
+import unittest
+
+import cef_package_update as cpu
+
+debian_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'debian')
+prefix = 'cef_binary_78.3.9_linux64/'
+
+def _member(name, kind=tarfile.REGTYPE, linkname=''):
+    tarinfo = tarfile.TarInfo(prefix + name)
+    tarinfo.type = kind
+    tarinfo.linkname = linkname
+    return tarinfo
+
+def _install_file(package):
+    return os.path.join(debian_dir, package + '.install')
+
+class install_file_globs_test(unittest.TestCase):
+    def test_release_package(self):
+        globs = cpu.install_file_globs([ _install_file('libcef${cef:ABI}') ])
+        self.assertEqual(globs[:len(cpu.extract_build_globs)], cpu.extract_build_globs)
+        self.assertIn('Release/libcef.so', globs)
+        self.assertIn('Release/*.bin', globs)
+        self.assertIn('Resources/icudtl.dat', globs)
+        self.assertIn('Resources/*', globs)
+        self.assertNotIn('Release/icudtl.dat', globs)
+        self.assertFalse([ g for g in globs if g.startswith('Debug/') ])
+        self.assertFalse([ g for g in globs if g.startswith('usr/') ])
+
+    def test_debug_package(self):
+        globs = cpu.install_file_globs([ _install_file('libcefd${cef:ABI}') ])
+        self.assertIn('Debug/libcef.so', globs)
+        self.assertIn('Debug/swiftshader/libEGL.so', globs)
+        self.assertNotIn('Release/libcef.so', globs)
+
+    def test_no_duplicates(self):
+        globs = cpu.install_file_globs([ _install_file('libcef${cef:ABI}'), _install_file('libcefd${cef:ABI}') ])
+        self.assertEqual(len(globs), len(set(globs)))
+
+    def test_missing_file(self):
+        self.assertEqual(cpu.install_file_globs([ os.path.join(debian_dir, 'missing.install') ]), cpu.extract_build_globs)
+
+class extract_globs_test(unittest.TestCase):
+    def setUp(self):
+        self.app = cpu.cef_package_update_app()
+        self.app._debian_dir = debian_dir
+
+    def test_extract_all(self):
+        self.assertIsNone(self.app._extract_globs('cef-78', {}))
+
+    def test_extract_packages(self):
+        globs = self.app._extract_globs('cef-78', { 'extract-packages': [ 'libcef${cef:ABI}', 'libcef${cef:ABI}-dev' ] })
+        for glob in cpu.cmake_install_globs:
+            self.assertIn(glob, globs)
+        self.assertEqual(len(globs), len(set(globs)))
+        self.assertFalse([ g for g in globs if g.startswith('Debug/') ])
+
+    def test_extract_include(self):
+        globs = self.app._extract_globs('cef-78', { 'extract-include': [ 'include/*', 'Release/libcef.so' ] })
+        self.assertEqual(globs[:2], [ 'include/*', 'Release/libcef.so' ])
+        self.assertEqual(set(globs), set([ 'include/*' ] + cpu.cmake_install_globs))
+
+class member_filter_test(unittest.TestCase):
+    def setUp(self):
+        self.filter = cpu.member_filter([ 'include/*', 'Release/libcef.so', 'Release/swiftshader/*' ], prefix=prefix)
+
+    def test_select_files(self):
+        self.assertTrue(self.filter(_member('include/cef_app.h')))
+        self.assertTrue(self.filter(_member('include/internal/cef_types.h')))
+        self.assertTrue(self.filter(_member('Release/libcef.so')))
+        self.assertTrue(self.filter(_member('Release/swiftshader/libEGL.so')))
+        self.assertFalse(self.filter(_member('Release/libEGL.so')))
+        self.assertFalse(self.filter(_member('Debug/libcef.so')))
+        self.assertFalse(self.filter(_member('README.txt')))
+
+    def test_parent_directories(self):
+        self.assertTrue(self.filter(tarfile.TarInfo(prefix)))
+        self.assertTrue(self.filter(_member('Release', tarfile.DIRTYPE)))
+        self.assertTrue(self.filter(_member('Release/swiftshader', tarfile.DIRTYPE)))
+        self.assertFalse(self.filter(_member('Debug', tarfile.DIRTYPE)))
+        # only directories are selected as parents
+        self.assertFalse(self.filter(_member('Release')))
+
+    def test_other_prefix(self):
+        tarinfo = tarfile.TarInfo('other/include/cef_app.h')
+        self.assertFalse(self.filter(tarinfo))
+
+    def test_deferred_links(self):
+        members = [
+            _member('Release/libEGL.so'),
+            _member('Release/swiftshader/libEGL.so', tarfile.LNKTYPE, prefix + 'Release/libEGL.so'),
+            _member('Release/libcef.so'),
+            _member('include/libcef.so', tarfile.LNKTYPE, prefix + 'Release/libcef.so'),
+            ]
+        selected = [ m.name for m in self.filter.select(members) ]
+        self.assertEqual(selected, [ prefix + 'Release/libcef.so', prefix + 'include/libcef.so' ])
+        self.assertEqual([ m.name for m in self.filter.deferred_links ], [ prefix + 'Release/swiftshader/libEGL.so' ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import shutil
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+
+class package_state_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'cef-78.state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_persisted(self):
+        state = cpu.package_state(self.filename)
+        self.assertFalse(state.unchanged('extract', { 'archive': 'a' }))
+        state.done('extract', { 'archive': 'a' }, last_build='78.3.9')
+        state = cpu.package_state(self.filename)
+        self.assertTrue(state.unchanged('extract', { 'archive': 'a' }))
+        self.assertFalse(state.unchanged('extract', { 'archive': 'b' }))
+        self.assertFalse(state.unchanged('configure', { 'archive': 'a' }))
+        self.assertEqual(state.get('last_build'), '78.3.9')
+
+    def test_damaged(self):
+        with open(self.filename, 'w') as f:
+            f.write('{ "stages": ')
+        state = cpu.package_state(self.filename)
+        self.assertFalse(state.unchanged('extract', {}))
+        state.done('extract', {})
+        self.assertTrue(cpu.package_state(self.filename).unchanged('extract', {}))
+
+class skip_stage_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.app = cpu.cef_package_update_app()
+        self.app._repo_dir = os.path.join(self.dir, 'repo')
+        self.inputs = { 'archive': 'a', 'include': [ 'include/*' ] }
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_skip_unchanged(self):
+        self.assertFalse(self.app._skip_stage('cef-78', 'extract', self.inputs))
+        self.app._package_state('cef-78').done('extract', self.inputs)
+        self.assertTrue(os.path.isfile(os.path.join(self.app._repo_dir, 'cef-78.state.json')))
+        self.assertTrue(self.app._skip_stage('cef-78', 'extract', self.inputs))
+        self.assertFalse(self.app._skip_stage('cef-78', 'extract', dict(self.inputs, archive='b')))
+        self.assertFalse(self.app._skip_stage('cef-79', 'extract', self.inputs))
+        self.assertEqual(self.app._skipped, { 'cef-78': [ 'extract' ] })
+
+    def test_state_per_package(self):
+        self.app._package_state('amd64/cef-78').done('extract', self.inputs)
+        self.assertTrue(os.path.isfile(os.path.join(self.app._repo_dir, 'amd64', 'cef-78.state.json')))
+        self.assertIs(self.app._package_state('amd64/cef-78'), self.app._package_state('amd64/cef-78'))
+
+    def test_force(self):
+        self.app._package_state('cef-78').done('extract', self.inputs)
+        for option in [ '_force', '_force_extract' ]:
+            setattr(self.app, option, True)
+            self.assertFalse(self.app._skip_stage('cef-78', 'extract', self.inputs))
+            setattr(self.app, option, False)
+        self.assertEqual(self.app._skipped, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cef_package_update as cpu
+
+class write_if_changed_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'control')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write_once(self):
+        self.assertTrue(cpu.write_if_changed(self.filename, b'Package: libcef78\n'))
+        ino = os.stat(self.filename).st_ino
+        self.assertFalse(cpu.write_if_changed(self.filename, b'Package: libcef78\n'))
+        self.assertEqual(os.stat(self.filename).st_ino, ino)
+        self.assertEqual(os.listdir(self.dir), [ 'control' ])
+
+    def test_same_size_other_content(self):
+        cpu.write_if_changed(self.filename, b'Package: libcef78\n')
+        self.assertTrue(cpu.write_if_changed(self.filename, b'Package: libcef79\n'))
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b'Package: libcef79\n')
+
+class render_manifest_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'debian')
+        self.dst = os.path.join(self.dir, 'out')
+        self.manifest = os.path.join(self.dir, 'cef-78.render.json')
+        os.makedirs(os.path.join(self.src, 'source'))
+        self._write('control', b'Source: ${cef:Source}\nPackage: libcef${cef:ABI}\n')
+        self._write('libcef${cef:ABI}.install', b'usr/lib/libcef.so usr/lib/${DEB_BUILD_MULTIARCH}/\n')
+        self._write('source/format', b'3.0 (quilt)\n')
+        self.values = { 'cef:ABI': 78, 'cef:Source': 'cef78' }
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.src, name), 'wb') as f:
+            f.write(data)
+
+    def _configure(self, values=None):
+        calls = []
+        configure_file = cpu.configure_file
+        def _configure_file(src, dst, **kwargs):
+            calls.append(os.path.relpath(src, self.src))
+            return configure_file(src, dst, **kwargs)
+        with mock.patch.object(cpu, 'configure_file', _configure_file):
+            self.assertTrue(cpu.copy_and_configure(self.src, self.dst, values=values or self.values, manifest_file=self.manifest))
+        return sorted(calls)
+
+    def _mtimes(self):
+        ret = {}
+        for root, dirs, files in os.walk(self.dst):
+            for name in files:
+                filename = os.path.join(root, name)
+                ret[os.path.relpath(filename, self.dst)] = os.stat(filename).st_mtime_ns
+        return ret
+
+    def test_first_run(self):
+        self.assertEqual(self._configure(), [ 'control', 'libcef${cef:ABI}.install' ])
+        self.assertEqual(sorted(self._mtimes().keys()), [ 'control', 'libcef78.install', 'source/format' ])
+        with open(self.manifest, 'r') as f:
+            self.assertEqual(sorted(json.load(f).keys()), [ 'control', 'libcef78.install', 'source/format' ])
+
+    def test_noop_run(self):
+        self._configure()
+        mtimes = self._mtimes()
+        self.assertEqual(self._configure(), [])
+        self.assertEqual(self._mtimes(), mtimes)
+
+    def test_touched_template(self):
+        self._configure()
+        mtimes = self._mtimes()
+        os.utime(os.path.join(self.src, 'control'), ns=(1500000000000000000, 1500000000000000000))
+        # rendered again, but the unchanged output is not rewritten
+        self.assertEqual(self._configure(), [ 'control' ])
+        self.assertEqual(self._mtimes(), mtimes)
+        self.assertEqual(self._configure(), [])
+
+    def test_changed_values(self):
+        self._configure()
+        self.assertEqual(self._configure(dict(self.values, **{ 'cef:Source': 'cef78-arm64' })), [ 'control', 'libcef${cef:ABI}.install' ])
+        with open(os.path.join(self.dst, 'control'), 'rb') as f:
+            self.assertEqual(f.read(), b'Source: cef78-arm64\nPackage: libcef78\n')
+
+    def test_modified_output(self):
+        self._configure()
+        with open(os.path.join(self.dst, 'control'), 'ab') as f:
+            f.write(b'Section: libs\n')
+        self.assertEqual(self._configure(), [ 'control' ])
+        with open(os.path.join(self.dst, 'control'), 'rb') as f:
+            self.assertEqual(f.read(), b'Source: cef78\nPackage: libcef78\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 4; mixedindent off; indent-mode python;
+import os
+import shutil
+import tempfile
+import unittest
+
+import cef_package_update as cpu
+
+class compiled_template_test(unittest.TestCase):
+    def _render(self, text, values):
+        return cpu.compiled_template(text.encode('utf-8')).render(values)
+
+    def test_substitute(self):
+        data, unknown = self._render('Package: libcef${cef:ABI}\nArchitecture: ${cef:Arch}\n', { 'cef:ABI': 78, 'cef:Arch': 'amd64' })
+        self.assertEqual(data, b'Package: libcef78\nArchitecture: amd64\n')
+        self.assertEqual(unknown, set())
+
+    def test_variables(self):
+        tmpl = cpu.compiled_template(b'${a} ${b} ${$}{c} ${a}')
+        self.assertEqual(tmpl.variables, set([ 'a', 'b' ]))
+
+    def test_dollar_escape(self):
+        data, unknown = self._render('${$}{cef:ABI} ${cef:ABI} $${x} ${$}', { 'cef:ABI': 78, 'x': 1 })
+        self.assertEqual(data, b'${cef:ABI} 78 $1 $')
+        self.assertEqual(unknown, set())
+
+    def test_unknown_variables_kept(self):
+        data, unknown = self._render('usr/lib/${DEB_BUILD_MULTIARCH}/ ${empty} ${} ${cef:ABI}', { 'empty': '', 'cef:ABI': 78 })
+        self.assertEqual(data, b'usr/lib/${DEB_BUILD_MULTIARCH}/ ${empty} ${} 78')
+        self.assertEqual(unknown, set([ 'DEB_BUILD_MULTIARCH', 'empty', '' ]))
+
+    def test_no_variable_across_lines(self):
+        data, unknown = self._render('${cef:\nABI} $(shell echo ${cef:ABI})', { 'cef:ABI': 78 })
+        self.assertEqual(data, b'${cef:\nABI} $(shell echo 78)')
+        self.assertEqual(unknown, set())
+
+    def test_unterminated(self):
+        data, unknown = self._render('${cef:ABI', { 'cef:ABI': 78 })
+        self.assertEqual(data, b'${cef:ABI')
+
+    def test_matches_substVars(self):
+        text = 'Source: ${cef:Source}\nDepends: ${shlibs:Depends}, libcef${cef:ABI} (= ${binary:Version})\n'
+        values = { 'cef:Source': 'cef78', 'cef:ABI': 78 }
+        changed, expected = cpu.substVars(text, values, empty_vars=False)
+        self.assertEqual(self._render(text, values)[0], expected.encode('utf-8'))
+
+    def test_binary_data(self):
+        data = b'\x89PNG\r\n\x1a\n${cef:ABI}\xff'
+        self.assertEqual(cpu.compiled_template(data).render({ 'cef:ABI': 78 }), (data, set()))
+
+class load_template_test(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'control')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_reload_changed(self):
+        with open(self.filename, 'w') as f:
+            f.write('${a}')
+        tmpl = cpu.load_template(self.filename)
+        self.assertIs(cpu.load_template(self.filename), tmpl)
+        with open(self.filename, 'w') as f:
+            f.write('${b}!')
+        self.assertEqual(cpu.load_template(self.filename).render({ 'b': 1 })[0], b'1!')
+
+if __name__ == '__main__':
+    unittest.main()